@@ -0,0 +1,96 @@
+import os
+import tempfile
+from itertools import count
+import numpy as np
+import matplotlib.animation
+import matplotlib.pyplot as plt
+from fourdsolids import EDGE_120CELL
+from render import *
+from projection import PROJECTIONS, plane_rotation
+
+class RotationAnimation:
+    """
+    Animates the edges of a 4D polytope turning through planes, a list of
+    (i, j) axis pairs each rotated by step radians per frame. The edges are
+    found once; every frame rotates the vertices, projects them to 3D and
+    writes the segments into one preallocated array drawn by a single
+    collection, which is all that blitting redraws. positions, if given,
+    maps a frame number to its 4D vertices instead. project is a name in
+    projection.PROJECTIONS or a function of (..., 4) points. A headless
+    animation draws with Agg, for save_frames and save_video only.
+    """
+    def __init__(self, vertices, planes=((0, 3),), step=np.pi/180, EDGE=EDGE_120CELL, scale=3,
+                 project='orthographic', positions=None, headless=False):
+        self.vertices = np.asarray(vertices, dtype=float)
+        self.planes, self.step, self.project = planes, step, PROJECTIONS.get(project, project)
+        self.positions = self.rotated if positions is None else positions
+        self.edges = edge_list(self.vertices, EDGE, min_degree=3)
+        self.segments = np.empty((len(self.edges), 2, 3))
+
+        self.fig = new_figure(headless=headless)
+        self.ax = self.fig.add_subplot(projection='3d')
+        self.ax.set_xlim(-scale, scale)
+        self.ax.set_ylim(-scale, scale)
+        self.ax.set_zlim(-scale, scale)
+        self.lines = draw_edges(self.ax, self.vertices, self.edges,
+            random_edge_colors(self.edges, len(self.vertices)), alpha=0.4)
+        self.update(0)
+
+    def rotation(self, frame):
+        rotation = np.eye(4)
+        for i, j in self.planes:
+            rotation = rotation@plane_rotation(i, j, frame*self.step)
+        return rotation
+
+    def rotated(self, frame):
+        return self.vertices@self.rotation(frame)
+
+    def update(self, frame):
+        np.take(self.project(self.positions(frame)), self.edges, axis=0, out=self.segments)
+        self.lines.set_segments(self.segments)
+        if self.ax.M is not None:       # blitting draws the collection without the axes projecting it
+            self.lines.do_3d_projection()
+        return (self.lines,)
+
+    def play(self, frames=None, fps=30):
+        # frames=None keeps turning until the window closes; no frame data is cached either way.
+        self.animation = matplotlib.animation.FuncAnimation(self.fig, self.update,
+            count() if frames is None else frames, interval=1000/fps, blit=True, cache_frame_data=False)
+        plt.show()
+
+    def save_frames(self, directory, frames, pattern='frame_{:05d}.png', dpi=100):
+        os.makedirs(directory, exist_ok=True)
+        paths = []
+        for frame in range(frames):
+            self.update(frame)
+            paths.append(os.path.join(directory, pattern.format(frame)))
+            self.fig.savefig(paths[-1], dpi=dpi)
+        return paths
+
+    def save_video(self, path, frames, fps=30, dpi=100, writer=None):
+        # Streams frames through a matplotlib writer; .gif uses pillow, anything else ffmpeg.
+        writer = writer or ('pillow' if path.endswith('.gif') else 'ffmpeg')
+        movie = matplotlib.animation.writers[writer](fps=fps)
+        with movie.saving(self.fig, path, dpi):
+            for frame in range(frames):
+                self.update(frame)
+                movie.grab_frame()
+
+def test_rotation_animation():
+    assert np.allclose(plane_rotation(0, 3, np.pi/2)@plane_rotation(0, 3, -np.pi/2), np.eye(4))
+    assert np.allclose(np.array([1, 0, 0, 0])@plane_rotation(0, 3, np.pi/2), [0, 0, 0, 1])
+    tesseract = np.array(np.meshgrid(*[[-1, 1]]*4)).reshape(4, -1).T
+    with tempfile.TemporaryDirectory() as out_dir:
+        engine = RotationAnimation(tesseract, planes=((0, 3), (1, 2)), step=np.pi/8, EDGE=2, headless=True)
+        assert len(engine.edges) == 32 and engine.fig.canvas.get_default_filetype() == 'png'
+        assert not plt.get_fignums()
+        segments = engine.segments
+        engine.update(4)     # a quarter turn in both planes maps the tesseract onto itself
+        assert engine.segments is segments and engine.lines._segments3d is segments
+        assert np.allclose(np.unique(segments.reshape(-1, 3).round(9), axis=0), np.unique(tesseract[:, :3], axis=0))
+        assert len(engine.save_frames(out_dir, 3)) == 3
+        engine.save_video(os.path.join(out_dir, 'turn.gif'), 3, fps=10)
+        assert os.path.getsize(os.path.join(out_dir, 'turn.gif')) > 0
+
+if __name__ == "__main__":
+    test_rotation_animation()
@@ -0,0 +1,138 @@
+import io
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import platform
+import tempfile
+import tracemalloc
+import contextlib
+import numpy as np
+from fourdsolids import *
+from topocache import build_topology, load_topology
+from headergen import write_declarations, SECTIONS
+
+SEED = 0
+DEFAULT_REPEAT = 5
+DEFAULT_THRESHOLD = 1.25
+
+def _solve_primary_neighbor_transforms(d4vs, t4vs):
+    from plotting import solve_primary_neighbor_transforms
+    with contextlib.redirect_stdout(io.StringIO()):
+        return solve_primary_neighbor_transforms(d4vs, t4vs)
+
+def _write_declarations(out_dir, topology):
+    # Every section from scratch: no manifest or header to reuse.
+    path = os.path.join(out_dir, 'dodecaplex.h')
+    for stale in (path, path+'.sections.json'):
+        if os.path.exists(stale):
+            os.remove(stale)
+    return write_declarations(topology, path, sections=tuple(SECTIONS))
+
+def stages(out_dir):
+    """
+    (name, function) in pipeline order. Each stage gets its inputs built
+    beforehand so only its own work is measured.
+    """
+    d4vs, t4vs = gen_dodecaplex_vertices(), gen_tetraplex_vertices()
+    cache_dir = os.path.join(out_dir, 'cache')
+    load_topology(cache_dir)
+    topology = build_topology()
+    return [
+        ('gen_dodecaplex_vertices',             gen_dodecaplex_vertices),
+        ('gen_dodecaplex_golden',               gen_dodecaplex_golden),
+        ('get_neighbor_map',                    lambda: get_neighbor_map(t4vs)),
+        ('yield_dodecahedrons_from_dodecaplex', lambda: list(yield_dodecahedrons_from_dodecaplex(d4vs, t4vs))),
+        ('solve_primary_neighbor_transforms',   lambda: _solve_primary_neighbor_transforms(d4vs, t4vs)),
+        ('build_topology',                      build_topology),
+        ('load_topology',                       lambda: load_topology(cache_dir)),
+        ('write_declarations',                  lambda: _write_declarations(out_dir, topology)),
+    ]
+
+def _seeded(function):
+    random.seed(SEED)
+    np.random.seed(SEED)
+    return function()
+
+def measure(function, repeat=DEFAULT_REPEAT):
+    """
+    Wall times of repeat seeded runs, then the peak traced allocation of
+    one more; tracing slows the code down, so it never overlaps the timing.
+    """
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        _seeded(function)
+        times.append(time.perf_counter()-start)
+    tracemalloc.start()
+    try:
+        _seeded(function)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return {'seconds': min(times), 'median_seconds': float(np.median(times)), 'runs': times, 'peak_bytes': peak}
+
+def run(names=None, repeat=DEFAULT_REPEAT):
+    with tempfile.TemporaryDirectory() as out_dir:
+        results = {name: measure(function, repeat) for name, function in stages(out_dir)
+                   if names is None or name in names}
+    return {
+        'meta': {
+            'time': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'python': platform.python_version(),
+            'numpy': np.__version__,
+            'machine': platform.machine(),
+            'seed': SEED,
+            'repeat': repeat,
+        },
+        'stages': results,
+    }
+
+def compare(results, baseline, threshold=DEFAULT_THRESHOLD):
+    # (stage, ratio) of every stage slower than threshold times its baseline, by best time.
+    regressions = []
+    for name, stage in results['stages'].items():
+        before = baseline['stages'].get(name)
+        if before and before['seconds'] > 0:
+            ratio = stage['seconds']/before['seconds']
+            if ratio > threshold:
+                regressions.append((name, ratio))
+    return regressions
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Time and measure every stage of the geometry pipeline.')
+    parser.add_argument('--output', help='write the results to this JSON file')
+    parser.add_argument('--baseline', help='JSON results to compare against')
+    parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD,
+                        help='fail when a stage takes more than this times its baseline')
+    parser.add_argument('--stages', nargs='+', help='only these stages')
+    parser.add_argument('--repeat', type=int, default=DEFAULT_REPEAT)
+    args = parser.parse_args(argv)
+
+    results = run(args.stages, args.repeat)
+    for name, stage in results['stages'].items():
+        print(f"{name:<40}{stage['seconds']*1000:>10.2f} ms{stage['peak_bytes']/2**20:>10.2f} MiB")
+    if args.output:
+        with open(args.output, 'w') as output:
+            json.dump(results, output, indent=1)
+    if args.baseline:
+        with open(args.baseline) as baseline:
+            regressions = compare(results, json.load(baseline), args.threshold)
+        for name, ratio in regressions:
+            print(f"regression: {name} is {ratio:.2f}x its baseline")
+        return 1 if regressions else 0
+    return 0
+
+def test_bench():
+    results = run(['gen_dodecaplex_vertices', 'get_neighbor_map'], repeat=2)
+    assert set(results['stages']) == {'gen_dodecaplex_vertices', 'get_neighbor_map'}
+    assert all(stage['seconds'] > 0 and stage['peak_bytes'] > 0 for stage in results['stages'].values())
+    slower = json.loads(json.dumps(results))
+    slower['stages']['get_neighbor_map']['seconds'] *= 2
+    assert compare(slower, results) == [('get_neighbor_map', 2.0)]
+    assert compare(results, slower) == [] and compare(slower, results, threshold=3) == []
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,117 @@
+from functools import lru_cache
+import numpy as np
+from topocache import load_topology
+
+@lru_cache(maxsize=None)
+def _shell_tables():
+    # Per origin: every cell ordered by hop distance, and where each distance's shell ends in that order.
+    distances = np.asarray(load_topology()['hop_distances'])
+    order = np.argsort(distances, axis=1, kind='stable')
+    ends = (distances[:, :, np.newaxis] <= np.arange(distances.max()+1)).sum(axis=1)
+    order.setflags(write=False)
+    shells = tuple(tuple(np.split(row, stops[:-1])) for row, stops in zip(order, ends))
+    return distances, order, ends, shells
+
+def hop_distance(a, b):
+    return int(_shell_tables()[0][a, b])
+
+def cells_within(origin, k):
+    """
+    Cells at most k steps from origin through the neighbor graph, nearest
+    shells first: a read-only view into a table built once per process.
+    """
+    _, order, ends, _ = _shell_tables()
+    return order[origin, :ends[origin, min(k, ends.shape[1]-1)]] if k >= 0 else order[origin, :0]
+
+def shells(origin):
+    # (cells at distance 0, cells at distance 1, ...) from origin.
+    return _shell_tables()[3][origin]
+
+LOCATE_CHUNK = 2**16
+
+@lru_cache(maxsize=None)
+def _locator_tables():
+    # Cell centers, and per cell the normals of the bisecting hyperplanes toward each of its neighbors.
+    topology = load_topology()
+    centers = np.array(topology['tetraplex_vertices'])
+    neighbors = np.asarray(topology['cell_neighbors'])
+    walls = centers[neighbors]-centers[:, np.newaxis]
+    for table in (centers, walls):
+        table.setflags(write=False)
+    return centers, neighbors, walls
+
+def locate(points, chunk=LOCATE_CHUNK):
+    """
+    (N,) index of the cell holding each of (N, 4) points, by nearest center
+    on the sphere: points need not be normalized. Points go through one
+    matmul and argmax per chunk of rows.
+    """
+    centers = _locator_tables()[0]
+    points = np.asarray(points, dtype=float).reshape(-1, 4)
+    cells = np.empty(len(points), dtype=np.intp)
+    for start in range(0, len(points), chunk):
+        np.argmax(points[start:start+chunk]@centers.T, axis=1, out=cells[start:start+chunk])
+    return cells
+
+def crossed_faces(starts, ends, cells=None, chunk=LOCATE_CHUNK):
+    """
+    For segments from (N, 4) starts to ends, the face (index into its
+    cell's row of cell_neighbors) through which each leaves the cell its
+    start is in, and the fraction of the chord at which it does; face -1
+    and fraction 1 for segments ending in the cell they start in. The
+    walls are hyperplanes through the origin, so the chord crosses them
+    where the great arc between its ends does.
+    """
+    _, neighbors, walls = _locator_tables()
+    starts, ends = np.asarray(starts, dtype=float).reshape(-1, 4), np.asarray(ends, dtype=float).reshape(-1, 4)
+    cells = locate(starts, chunk) if cells is None else np.asarray(cells)
+    faces, fractions = np.empty(len(starts), dtype=np.intp), np.empty(len(starts))
+    for start in range(0, len(starts), chunk):
+        rows = slice(start, start+chunk)
+        cell_walls = walls[cells[rows]]
+        before = np.einsum('nki,ni->nk', cell_walls, starts[rows])
+        after = np.einsum('nki,ni->nk', cell_walls, ends[rows])
+        leaving = after > 0
+        with np.errstate(divide='ignore', invalid='ignore'):
+            at = np.where(leaving, np.clip(before/(before-after), 0, 1), np.inf)
+        first = np.argmin(at, axis=1)
+        fraction = np.take_along_axis(at, first[:, np.newaxis], axis=1)[:, 0]
+        left = np.isfinite(fraction)
+        faces[rows] = np.where(left, first, -1)
+        fractions[rows] = np.where(left, fraction, 1)
+    return faces, fractions
+
+def test_locate():
+    centers, neighbors, _ = _locator_tables()
+    rng = np.random.default_rng(0)
+    points = rng.normal(size=(20000, 4))
+    cells = locate(points, chunk=999)
+    expected = np.argmin(np.linalg.norm(points[:, np.newaxis]/np.linalg.norm(points, axis=1)[:, np.newaxis, np.newaxis]
+                                        -centers, axis=-1), axis=1)
+    assert np.array_equal(cells, expected)
+    assert np.array_equal(locate(centers*3), np.arange(120))
+
+    ends = points+0.3*rng.normal(size=points.shape)
+    faces, fractions = crossed_faces(points, ends, chunk=777)
+    end_cells = locate(ends)
+    stays = faces == -1
+    assert np.all(end_cells[stays] == cells[stays]) and np.all(fractions[stays] == 1)
+    crossing = points[~stays]+fractions[~stays, np.newaxis]*(ends-points)[~stays]
+    beyond = crossing+1e-9*(ends-points)[~stays]
+    assert np.array_equal(locate(beyond), neighbors[cells[~stays], faces[~stays]])
+    single = (end_cells != cells) & np.isin(end_cells, neighbors[cells])
+    assert np.all(faces[single] >= 0)
+    assert crossed_faces(centers[:1], centers[neighbors[0, 5]][np.newaxis])[0].tolist() == [5]
+
+def test_queries():
+    distances = np.asarray(load_topology()['hop_distances'])
+    for origin in (0, 77):
+        assert [len(shell) for shell in shells(origin)] == [1, 12, 32, 42, 32, 1]
+        assert all(np.all(distances[origin, shell] == hops) for hops, shell in enumerate(shells(origin)))
+        assert np.array_equal(cells_within(origin, 2), np.concatenate(shells(origin)[:3]))
+        assert len(cells_within(origin, 99)) == 120 and len(cells_within(origin, -1)) == 0
+    assert cells_within(0, 0).tolist() == [0] and hop_distance(0, shells(0)[5][0]) == 5
+
+if __name__ == "__main__":
+    test_queries()
+    test_locate()
@@ -0,0 +1,251 @@
+import numpy as np
+from functools import lru_cache
+from itertools import combinations
+
+# Branches (node, node, m) of the Coxeter diagrams on nodes 0-3; unlisted pairs commute (m = 2).
+DIAGRAMS = {
+    'A4': ((0, 1, 3), (1, 2, 3), (2, 3, 3)),
+    'B4': ((0, 1, 4), (1, 2, 3), (2, 3, 3)),
+    'D4': ((0, 1, 3), (1, 2, 3), (1, 3, 3)),
+    'F4': ((0, 1, 3), (1, 2, 4), (2, 3, 3)),
+    'H4': ((0, 1, 5), (1, 2, 3), (2, 3, 3)),
+}
+GROUP_ORDERS = {'A4': 120, 'B4': 384, 'D4': 192, 'F4': 1152, 'H4': 14400}
+KEY_SCALE = 2**20       # coordinates are told apart after rounding to this many steps per unit
+
+# (group, ringed nodes) of named uniform polytopes
+POLYTOPES = {
+    '5-cell':       ('A4', (0,)),
+    'tesseract':    ('B4', (0,)),
+    '16-cell':      ('B4', (3,)),
+    'demitesseract': ('D4', (0,)),
+    '24-cell':      ('F4', (0,)),
+    '120-cell':     ('H4', (0,)),
+    '600-cell':     ('H4', (3,)),
+}
+
+def coxeter_matrix(group):
+    m = np.full((4, 4), 2)
+    np.fill_diagonal(m, 1)
+    for i, j, order in DIAGRAMS[group]:
+        m[i, j] = m[j, i] = order
+    return m
+
+def simple_roots(group):
+    # (4, 4) unit roots, one per row, at the angles pi - pi/m of the diagram.
+    return np.linalg.cholesky(-np.cos(np.pi/coxeter_matrix(group)))
+
+def _keys(rows):
+    return np.round(np.reshape(rows, (len(rows), -1))*KEY_SCALE).astype(np.int64)
+
+def _first_unique(keys):
+    # Ids of the distinct rows of keys numbered by first appearance, and the rows they first appear at.
+    _, first, inverse = np.unique(keys, axis=0, return_index=True, return_inverse=True)
+    rank = np.empty(len(first), dtype=np.intp)
+    rank[np.argsort(first)] = np.arange(len(first))
+    return rank[inverse.ravel()], np.sort(first)
+
+@lru_cache(maxsize=None)
+def group_elements(group):
+    """
+    (elements, 4, 4) matrices of the reflection group, acting on row
+    vectors, the identity first; and the (4, elements) table of the index of
+    each generating reflection times each element, S_i@E_g. Built breadth
+    first, one batched product of the generators with every new element.
+    """
+    roots = simple_roots(group)
+    reflections = np.eye(4)-2*np.einsum('ki,kj->kij', roots, roots)
+    elements, found = [np.eye(4)], {_keys(np.eye(4)[np.newaxis])[0].tobytes(): 0}
+    frontier, left = [0], []
+    while frontier:
+        products = reflections[:, np.newaxis]@np.array([elements[g] for g in frontier])
+        indices = np.empty(products.shape[:2], dtype=np.intp)
+        for (i, k), key in zip(np.ndindex(*indices.shape), _keys(products.reshape(-1, 4, 4))):
+            key = key.tobytes()
+            if key not in found:
+                found[key] = len(elements)
+                elements.append(products[i, k])
+            indices[i, k] = found[key]
+        left.append(indices)
+        frontier = list(range(frontier[-1]+1, len(elements)))
+    elements, left = np.array(elements), np.concatenate(left, axis=1)
+    assert len(elements) == GROUP_ORDERS[group]
+    elements.setflags(write=False)
+    left.setflags(write=False)
+    return elements, left
+
+def _subgroup_words(left, generators):
+    # Elements of the subgroup the generators span, breadth first: each is S_gens[k]@(element parents[k]).
+    order, parents, gens, seen = [0], [-1], [-1], {0}
+    for k in range(len(left[0])):
+        if k == len(order):
+            break
+        for j in generators:
+            h = left[j, order[k]]
+            if h not in seen:
+                seen.add(h)
+                order += [h]
+                parents += [k]
+                gens += [j]
+    return order, parents, gens
+
+def _word_images(left, parents, gens):
+    # (words, elements) index of every word times every element E_g, one table lookup per word.
+    images = np.empty((len(parents), left.shape[1]), dtype=np.intp)
+    images[0] = np.arange(left.shape[1])
+    for k in range(1, len(parents)):
+        images[k] = left[gens[k], images[parents[k]]]
+    return images
+
+def _components(nodes, m):
+    components = []
+    for node in nodes:
+        joined = [c for c in components if any(m[node, other] > 2 for other in c)]
+        components = [c for c in components if c not in joined]+[sum(joined, [node])]
+    return components
+
+def _is_face(nodes, rings, m):
+    # Wythoff: a subdiagram spans a face of full dimension when each of its components holds a ring.
+    return all(set(c) & set(rings) for c in _components(nodes, m))
+
+@lru_cache(maxsize=None)
+def wythoff(group, rings):
+    """
+    The uniform polytope of the group's diagram with the given nodes
+    ringed, on the unit sphere. Vertices are the orbit of the seed lying on
+    every mirror but the ringed ones, in one batched product with the group
+    elements. Each k-face is the orbit of the seed under the subgroup of k
+    nodes whose components are all ringed, moved by every element; numbering
+    follows first appearance along the elements. Returns a dict of
+        vertices    (V, 4)
+        edges       (E, 2) vertex indices
+        faces       list of (F, k) polygons in boundary order, one per face type
+        cells       list of (C, n) sorted vertex indices, one per cell type
+        cell_faces  list of (C, f) indices into the concatenated faces
+    """
+    rings = tuple(sorted(rings))
+    m = coxeter_matrix(group)
+    elements, left = group_elements(group)
+    seed = np.linalg.solve(simple_roots(group), np.isin(np.arange(4), rings).astype(float))
+    seed /= np.linalg.norm(seed)
+    orbit = np.matmul(seed, elements)
+    vertex_of, first = _first_unique(_keys(orbit))
+    stabilizer = _subgroup_words(left, [i for i in range(4) if i not in rings])[0]
+    assert len(first)*len(stabilizer) == len(elements)
+    vertices = orbit[first]
+
+    edges = np.concatenate([np.sort(np.stack((vertex_of, vertex_of[left[i]]), axis=1), axis=1) for i in rings])
+    edges = edges[_first_unique(edges)[1]]
+
+    face_types, face_of = [], []
+    for i, j in combinations(range(4), 2):
+        if not _is_face((i, j), rings, m):
+            continue
+        gens = [-1]+[(i, j)[k%2] for k in range(2*m[i, j]-1)]
+        images = vertex_of[_word_images(left, [-1]+list(range(len(gens)-1)), gens)]
+        cycles = images[images[:, 0] != np.roll(images[:, 0], 1)].T
+        ids, representatives = _first_unique(np.sort(cycles, axis=1))
+        face_types.append(((i, j), cycles[representatives]))
+        face_of.append(ids+sum(len(f) for _, f in face_types[:-1]))
+
+    cells, cell_faces = [], []
+    for nodes in combinations(range(4), 3):
+        if not _is_face(nodes, rings, m):
+            continue
+        _, parents, gens = _subgroup_words(left, nodes)
+        images = vertex_of[_word_images(left, parents, gens)]
+        members = np.sort(images[np.unique(images[:, 0], return_index=True)[1]].T, axis=1)
+        cell_of, representatives = _first_unique(members)
+        cells.append(members[representatives])
+        incidence = np.unique(np.concatenate([np.stack((cell_of, ids), axis=1)
+            for (pair, _), ids in zip(face_types, face_of) if set(pair) <= set(nodes)]), axis=0)
+        cell_faces.append(incidence[:, 1].reshape(len(representatives), -1))
+
+    polytope = {
+        'vertices': vertices,
+        'edges': edges,
+        'faces': [f for _, f in face_types],
+        'cells': cells,
+        'cell_faces': cell_faces,
+    }
+    for array in [vertices, edges]+polytope['faces']+cells+cell_faces:
+        array.setflags(write=False)
+    return polytope
+
+def header_topology(polytope):
+    """
+    The arrays headergen's cell tables read, for a polytope with a single
+    cell and face type: cell_vertices, the cell_neighbors across each face
+    and the cell_faces wound counter-clockwise seen from outside their cell,
+    starting from their lowest vertex index, as get_cell_pentagons does.
+    """
+    if len(polytope['cells']) != 1 or len(polytope['faces']) != 1:
+        raise ValueError('the header tables need a single cell and face type')
+    vertices, faces = polytope['vertices'], polytope['faces'][0]
+    cell_vertices, face_ids = polytope['cells'][0], polytope['cell_faces'][0]
+    cells, faces_per_cell = face_ids.shape
+    assert np.all(np.bincount(face_ids.ravel()) == 2)
+    owners = np.argsort(face_ids.ravel(), kind='stable').reshape(-1, 2)
+    neighbors = np.empty(face_ids.size, dtype=np.intp)
+    neighbors[owners[:, 0]] = owners[:, 1]//faces_per_cell
+    neighbors[owners[:, 1]] = owners[:, 0]//faces_per_cell
+
+    cycles = faces[face_ids]
+    k = cycles.shape[-1]
+    cycles = np.take_along_axis(cycles, (np.arange(k)+np.argmin(cycles, axis=-1)[..., np.newaxis]) % k, axis=-1)
+    points = vertices[cycles]
+    centers = vertices[cell_vertices].mean(axis=1)[:, np.newaxis]
+    frames = np.stack((np.broadcast_to(centers, points.shape[:2]+(4,)), points[..., 1, :]-points[..., 0, :],
+                       points[..., 2, :]-points[..., 0, :], points.mean(axis=-2)-centers), axis=-2)
+    reverse = np.r_[0, np.arange(k-1, 0, -1)]
+    cycles = np.where((np.linalg.det(frames) < 0)[..., np.newaxis], cycles[..., reverse], cycles)
+    return {
+        'vertices': np.asarray(vertices),
+        'cell_vertices': np.asarray(cell_vertices),
+        'cell_neighbors': neighbors.reshape(cells, faces_per_cell),
+        'cell_faces': cycles,
+    }
+
+def test_polytopes():
+    from fourdsolids import EDGE_120CELL, DISTANCE_600CELL
+    counts = {
+        '5-cell':           (5, 10, 10, 5),
+        'tesseract':        (16, 32, 24, 8),
+        '16-cell':          (8, 24, 32, 16),
+        'demitesseract':    (8, 24, 32, 16),
+        '24-cell':          (24, 96, 96, 24),
+        '120-cell':         (600, 1200, 720, 120),
+        '600-cell':         (120, 720, 1200, 600),
+    }
+    for group, order in GROUP_ORDERS.items():
+        elements, left = group_elements(group)
+        assert np.allclose(elements@elements.swapaxes(-1, -2), np.eye(4)) and len(elements) == order
+        assert all(np.array_equal(left[i, left[i]], np.arange(order)) for i in range(4))   # involutions
+    for name, (group, rings) in POLYTOPES.items():
+        polytope = wythoff(group, rings)
+        vertices, edges = polytope['vertices'], polytope['edges']
+        found = (len(vertices), len(edges), sum(map(len, polytope['faces'])), sum(map(len, polytope['cells'])))
+        assert found == counts[name], (name, found)
+        assert np.allclose(np.linalg.norm(vertices, axis=1), 1)
+        lengths = np.linalg.norm(vertices[edges[:, 0]]-vertices[edges[:, 1]], axis=1)
+        assert np.allclose(lengths, lengths[0])
+        if len(polytope['cells']) == 1:
+            topology = header_topology(polytope)
+            for cell_faces in topology['cell_faces']:
+                directed = {tuple(e) for face in cell_faces.tolist() for e in zip(face, face[1:]+face[:1])}
+                assert directed == {(b, a) for a, b in directed}, name
+            assert np.all(np.sort(topology['cell_neighbors'], axis=1)[:, 1:] != np.sort(topology['cell_neighbors'], axis=1)[:, :-1])
+    for rings, edge in (((0,), EDGE_120CELL/8**0.5), ((3,), DISTANCE_600CELL)):    # dodecaplex radius is sqrt(8)
+        polytope = wythoff('H4', rings)
+        assert np.isclose(np.linalg.norm(np.subtract(*polytope['vertices'][polytope['edges'][0]])), edge)
+    omnitruncated = wythoff('H4', (0, 1, 2, 3))
+    assert len(omnitruncated['vertices']) == 14400 and len(omnitruncated['edges']) == 28800
+    assert [len(c) for c in omnitruncated['cells']] == [120, 720, 1200, 600]
+    try:
+        header_topology(omnitruncated)
+        assert False
+    except ValueError:
+        pass
+
+if __name__ == "__main__":
+    test_polytopes()
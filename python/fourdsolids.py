@@ -1,6 +1,20 @@
+import os
+import sys
 import numpy as np
-from math import isclose
 from mathhelpers import *
+from neighbors import neighbor_csr, csr_rows
+from golden import GOLDEN, golden, norm2, equal, to_float, pairs_at_distance
+from stagetimer import timed
+
+__all__ = ['PHI', 'EDGE_120CELL', 'EDGE_600CELL', 'RADIUS_120CELL', 'DISTANCE_600CELL',
+    'DODECAPLEX_GOLDEN', 'TETRAPLEX_GOLDEN', 'DODECAPLEX_POINTS', 'TETRAPLEX_POINTS',
+    'EDGE_120CELL_SQUARED', 'RADIUS_120CELL_SQUARED', 'DISTANCE_600CELL_SQUARED', 'IMPORT_BUDGET',
+    'HEAVY_MODULES', 'D_EVENS', 'T_EVENS', 'gen_dodecaplex_vertices', 'gen_tetraplex_vertices',
+    'gen_dodecaplex_golden', 'gen_tetraplex_golden', 'get_seperation', 'get_neighbors',
+    'get_cell_incidence', 'yield_dodecahedrons_from_dodecaplex',
+    'yield_indexed_dodecahedrons_from_dodecaplex', 'get_neighbor_map', 'get_hop_distances',
+    'get_cell_faces', 'get_cell_pentagons', 'get_face_neighbors', 'get_face_adjacency',
+    'get_neighbor_transforms']
 
 PHI = (1+(5**0.5))/2
 EDGE_120CELL = 3 - (5**0.5)
@@ -9,38 +23,54 @@ RADIUS_120CELL = (6-(5**0.5))**0.5
 DISTANCE_600CELL = PHI-1
 #LATENT_WARP = PHI/2
 
-DODECAPLEX_POINTS = [
-    (0,       0,              2,          2           ),
-    (PHI,     PHI,            PHI,        (PHI**(-2)) ),
-    (1,       1,              1,          (5**(0.5))  ),
-    ((1/PHI), (1/PHI),        (1/PHI),    (PHI*PHI)   ),
-    (0,       (1/PHI),        PHI,        (5**(0.5))  ),
-    (0,       (PHI**(-2)),    1,          (PHI**2)    ),
-    ((1/PHI), 1,              PHI,        2           ),
-]     # https://en.wikipedia.org/wiki/120-cell
-
-TETRAPLEX_POINTS = [
-    (0,      0,          0,      1   ),
-    (0.5,    0.5,        0.5,    0.5 ),
-    (0,      (0.5*PHI),  0.5,    (0.5/PHI))
-]    # https://en.wikipedia.org/wiki/600-cell
+# Seeds as exact (a, b, d) = (a + b*PHI)/d, see golden.GOLDEN_TABLE
+DODECAPLEX_GOLDEN = golden(*np.moveaxis(np.array([
+    [(0, 0, 1),     (0, 0, 1),      (2, 0, 1),  (2, 0, 1)   ],
+    [(0, 1, 1),     (0, 1, 1),      (0, 1, 1),  (2, -1, 1)  ],
+    [(1, 0, 1),     (1, 0, 1),      (1, 0, 1),  (-1, 2, 1)  ],
+    [(-1, 1, 1),    (-1, 1, 1),     (-1, 1, 1), (1, 1, 1)   ],
+    [(0, 0, 1),     (-1, 1, 1),     (0, 1, 1),  (-1, 2, 1)  ],
+    [(0, 0, 1),     (2, -1, 1),     (1, 0, 1),  (1, 1, 1)   ],
+    [(-1, 1, 1),    (1, 0, 1),      (0, 1, 1),  (2, 0, 1)   ],
+]), -1, 0))     # https://en.wikipedia.org/wiki/120-cell
+
+TETRAPLEX_GOLDEN = golden(*np.moveaxis(np.array([
+    [(0, 0, 1),     (0, 0, 1),      (0, 0, 1),  (1, 0, 1)   ],
+    [(1, 0, 2),     (1, 0, 2),      (1, 0, 2),  (1, 0, 2)   ],
+    [(0, 0, 1),     (0, 1, 2),      (1, 0, 2),  (-1, 1, 2)  ],
+]), -1, 0))     # https://en.wikipedia.org/wiki/600-cell
+
+DODECAPLEX_POINTS = [tuple(p) for p in to_float(DODECAPLEX_GOLDEN).tolist()]
+TETRAPLEX_POINTS = [tuple(p) for p in to_float(TETRAPLEX_GOLDEN).tolist()]
+
+# Exact squares of the distances above, for the tolerance free GOLDEN path
+EDGE_120CELL_SQUARED = golden(20, -12)
+RADIUS_120CELL_SQUARED = golden(7, -2)
+DISTANCE_600CELL_SQUARED = golden(2, -1)
+
+IMPORT_BUDGET = 0.1    # seconds to import this module once numpy is loaded
+HEAVY_MODULES = {'matplotlib', 'scipy', 'sympy', 'svgelements', 'moderngl_window'}
 
 D_EVENS = [0,0,0,0,1,1,1] 
 T_EVENS = [0,0,1]
 
 def test_initialization():
     for point, length, even in zip(DODECAPLEX_POINTS, [24, 64, 64, 64, 96, 96, 192], D_EVENS):
-        assert len(unsigned_permutations(point, even=even)) == length
+        assert len(signed_permutations([point], [even])) == length
     for point, length, even in zip(TETRAPLEX_POINTS, [8, 16, 96], T_EVENS):
-        assert len(unsigned_permutations(point, even=even)) == length
+        assert len(signed_permutations([point], [even])) == length
+    assert len(gen_dodecaplex_vertices()) == 600
+    assert len(gen_tetraplex_vertices()) == 120
+
+def test_golden_vertices():
+    d4vs, t4vs = gen_dodecaplex_golden(), gen_tetraplex_golden()
+    assert np.array_equal(to_float(d4vs), gen_dodecaplex_vertices())
+    assert np.array_equal(to_float(t4vs), gen_tetraplex_vertices())
+    assert np.unique(d4vs, axis=0).shape == d4vs.shape
+    assert np.all(equal(norm2(d4vs), golden(8))) and np.all(equal(norm2(t4vs), golden(1)))
 
 def _assemble_perms(points, evens):
-    out = []
-    for p,e in zip(points, evens):
-        out.extend([
-                tuple(NamedFloat(x, get_cpp_repr(x)) for x in q) 
-                    for q in unsigned_permutations(p,e)])
-    return tuple(out)
+    return tuple(map(tuple, signed_permutations(points, evens).tolist()))
 
 def gen_dodecaplex_vertices():
     return _assemble_perms(DODECAPLEX_POINTS, D_EVENS)
@@ -48,28 +78,266 @@ def gen_dodecaplex_vertices():
 def gen_tetraplex_vertices():
     return _assemble_perms(TETRAPLEX_POINTS, T_EVENS)
 
+@timed
+def gen_dodecaplex_golden():
+    return golden_signed_permutations(DODECAPLEX_GOLDEN, D_EVENS)
+
+@timed
+def gen_tetraplex_golden():
+    return golden_signed_permutations(TETRAPLEX_GOLDEN, T_EVENS)
+
+def _adjacency(points, distance, squared_distance, others=None):
+    # GOLDEN points are matched exactly, anything else to within a tolerance.
+    if getattr(points, 'dtype', None) == GOLDEN:
+        return pairs_at_distance(points, squared_distance, others=others)
+    return neighbor_csr(points, distance, others=others)
+
 def get_seperation(origin, other):
     return np.linalg.norm(np.array(origin)-np.array(other))
 
 def get_neighbors(origin, others):
-    neighbor_indeces = tuple( i for i, other in enumerate(others) if isclose(get_seperation(origin, other), DISTANCE_600CELL))
+    origin = origin[np.newaxis] if getattr(origin, 'dtype', None) == GOLDEN else [origin]
+    _, neighbor_indeces = _adjacency(origin, DISTANCE_600CELL, DISTANCE_600CELL_SQUARED, others=others)
     assert len(neighbor_indeces) == 12
-    return neighbor_indeces
+    return tuple(neighbor_indeces.tolist())
+
+@timed
+def get_cell_incidence(dodecaplex_4d_verts, tetraplex_4d_verts):
+    # (cells, 20) vertex indices of every cell and the inverse (vertices, 4) cell indices.
+    indptr, indices = _adjacency(tetraplex_4d_verts, RADIUS_120CELL, RADIUS_120CELL_SQUARED, others=dodecaplex_4d_verts)
+    assert np.all(np.diff(indptr) == 20)
+    cell_verts = indices.reshape(-1, 20)
+    assert np.all(np.bincount(indices, minlength=len(dodecaplex_4d_verts)) == 4)
+    vertex_cells = (np.argsort(indices, kind='stable')//20).reshape(-1, 4)
+    return cell_verts, vertex_cells
 
 def yield_dodecahedrons_from_dodecaplex(dodecaplex_4d_verts, tetraplex_4d_verts):
-    for ov in tetraplex_4d_verts:
-        cell_points = set(v for v in dodecaplex_4d_verts if isclose(get_seperation(v, ov), RADIUS_120CELL))
-        assert len(cell_points) == 20
-        yield cell_points
+    cell_verts, _ = get_cell_incidence(dodecaplex_4d_verts, tetraplex_4d_verts)
+    for row in cell_verts.tolist():
+        yield {dodecaplex_4d_verts[i] for i in row}
 
 def yield_indexed_dodecahedrons_from_dodecaplex(dodecaplex_4d_verts, tetraplex_4d_verts):
-    for ov in tetraplex_4d_verts:
-        cell_points = set(tuple((i,v)) for i,v in enumerate(dodecaplex_4d_verts) if isclose(get_seperation(v, ov), RADIUS_120CELL))
-        assert len(cell_points) == 20
-        yield cell_points
+    cell_verts, _ = get_cell_incidence(dodecaplex_4d_verts, tetraplex_4d_verts)
+    for row in cell_verts.tolist():
+        yield {(i, dodecaplex_4d_verts[i]) for i in row}
 
+@timed
 def get_neighbor_map(tetraplex_4d_verts):
-    return {i : get_neighbors(center, tetraplex_4d_verts) for i, center in enumerate(tetraplex_4d_verts)}
+    indptr, indices = _adjacency(tetraplex_4d_verts, DISTANCE_600CELL, DISTANCE_600CELL_SQUARED)
+    assert np.all(np.diff(indptr) == 12)
+    return dict(enumerate(csr_rows(indptr, indices)))
+
+@timed
+def get_hop_distances(neighbor_map):
+    """
+    (cells, cells) number of steps between every two cells through the
+    neighbor graph, by breadth first search from all cells at once.
+    """
+    cells = len(neighbor_map)
+    adjacency = np.zeros((cells, cells), dtype=np.int32)
+    for cell in range(cells):
+        adjacency[cell, list(neighbor_map[cell])] = 1
+    distances = np.full((cells, cells), -1, dtype=np.int8)
+    frontier = np.eye(cells, dtype=np.int32)
+    hops = 0
+    while frontier.any():
+        distances[frontier > 0] = hops
+        frontier = ((frontier@adjacency > 0) & (distances < 0)).astype(np.int32)
+        hops += 1
+    assert np.all(distances >= 0)
+    return distances
+
+@timed
+def get_cell_faces(cell_verts, cell_neighbors):
+    # (cells, 12, 5) sorted vertex indices of the pentagon each cell shares with each of its neighbors.
+    membership = np.zeros((len(cell_verts), cell_verts.max()+1), dtype=bool)
+    np.put_along_axis(membership, cell_verts, True, axis=1)
+    shared = membership[:, np.newaxis, :] & membership[cell_neighbors]
+    assert np.all(shared.sum(axis=-1) == 5)
+    return np.nonzero(shared)[2].reshape(*cell_neighbors.shape, 5)
+
+@timed
+def get_cell_pentagons(dodecaplex_4d_verts, tetraplex_4d_verts, cell_faces):
+    """
+    Orders the vertices of every (cells, faces, 5) face along the cell's edge
+    graph: starting from its lowest vertex index and winding counter-clockwise
+    seen from outside the cell, in the cell's hyperplane oriented by its center.
+    """
+    faces = np.sort(cell_faces, axis=-1)
+    points = np.asarray(dodecaplex_4d_verts, dtype=float)[faces]
+    seperations = np.linalg.norm(points[..., :, np.newaxis, :]-points[..., np.newaxis, :, :], axis=-1)
+    edges = np.isclose(seperations, EDGE_120CELL)
+    assert np.all(edges.sum(axis=-1) == 2)
+    sides = np.argsort(~edges, axis=-1, kind='stable')[..., :2]
+
+    order = np.zeros(faces.shape, dtype=np.intp)
+    order[..., 1] = sides[..., 0, 0]
+    for step in range(2, faces.shape[-1]):
+        options = np.take_along_axis(sides, order[..., step-1, np.newaxis, np.newaxis], axis=-2)[..., 0, :]
+        order[..., step] = np.where(options[..., 0] == order[..., step-2], options[..., 1], options[..., 0])
+
+    cycles = np.take_along_axis(points, order[..., np.newaxis], axis=-2)
+    face_centers = cycles.mean(axis=-2)
+    outward = face_centers-face_centers.mean(axis=1, keepdims=True)
+    normals = np.broadcast_to(np.asarray(tetraplex_4d_verts, dtype=float)[:, np.newaxis], outward.shape)
+    frames = np.stack((normals, cycles[..., 1, :]-cycles[..., 0, :], cycles[..., 2, :]-cycles[..., 0, :], outward), axis=-2)
+    clockwise = np.linalg.det(frames) < 0
+    order = np.where(clockwise[..., np.newaxis], order[..., [0, 4, 3, 2, 1]], order)
+    return np.take_along_axis(faces, order, axis=-1)
+
+@timed
+def get_face_neighbors(cell_faces):
+    # (cells, faces) index of the cell on the other side of each face, faces matched by their sorted vertex indices.
+    cells, faces_per_cell = cell_faces.shape[:2]
+    keys = np.sort(np.reshape(cell_faces, (cells*faces_per_cell, -1)), axis=1)
+    _, face_ids = np.unique(keys, axis=0, return_inverse=True)
+    face_ids = face_ids.ravel()
+    assert np.all(np.bincount(face_ids) == 2)
+    owners = np.argsort(face_ids, kind='stable').reshape(-1, 2)
+    neighbors = np.empty(cells*faces_per_cell, dtype=np.intp)
+    neighbors[owners[:, 0]] = owners[:, 1]//faces_per_cell
+    neighbors[owners[:, 1]] = owners[:, 0]//faces_per_cell
+    return neighbors.reshape(cells, faces_per_cell)
+
+def _rows_where(mask, values):
+    counts = mask.sum(axis=1)
+    assert np.all(counts == counts[0])
+    return np.sort(np.where(mask, values, np.iinfo(values.dtype).max), axis=1)[:, :counts[0]]
+
+@timed
+def get_face_adjacency(cell_faces):
+    """
+    For every face of (cells, faces, k) vertex indices, given in boundary
+    order, the flat indices of the faces sharing one of its edges: those of
+    the same cell (INTERIOR), those of the cell across the face (EXTERIOR)
+    and those of the remaining cells around its edges (ADJACENT).
+    """
+    cells, faces_per_cell, k = cell_faces.shape
+    faces = cell_faces.reshape(-1, k)
+    face_edges = np.sort(np.stack((faces, np.roll(faces, -1, axis=1)), axis=-1), axis=-1)
+    _, edge_ids = np.unique(face_edges.reshape(-1, 2), axis=0, return_inverse=True)
+    edge_ids = edge_ids.reshape(len(faces), k)
+    per_edge = np.bincount(edge_ids.ravel())
+    assert np.all(per_edge == per_edge[0])
+    by_edge = (np.argsort(edge_ids.ravel(), kind='stable')//k).reshape(-1, per_edge[0])
+
+    _, face_keys = np.unique(np.sort(faces, axis=1), axis=0, return_inverse=True)
+    face_keys = face_keys.ravel()
+    face_cells = np.arange(len(faces))//faces_per_cell
+    across = get_face_neighbors(cell_faces).ravel()
+
+    candidates = by_edge[edge_ids].reshape(len(faces), -1)
+    other = face_keys[candidates] != face_keys[:, np.newaxis]
+    candidate_cells = face_cells[candidates]
+    interior = other & (candidate_cells == face_cells[:, np.newaxis])
+    exterior = other & (candidate_cells == across[:, np.newaxis])
+    adjacent = other & ~interior & ~exterior
+    return tuple(_rows_where(mask, candidates) for mask in (interior, exterior, adjacent))
+
+@timed
+def get_neighbor_transforms(dodecaplex_4d_verts, tetraplex_4d_verts, cell_verts, cell_neighbors):
+    """
+    (cells, neighbors, 4, 4) matrices M with neighbor_points@M landing on
+    the cell's own points. Each starts from the double rotation turning the
+    neighbor's center onto the cell's within their common plane and half
+    turning the plane orthogonal to it; that guess pairs up the two cells'
+    vertices, and the pairs are fit by a batched orthogonal Procrustes solve.
+    """
+    verts = np.asarray(dodecaplex_4d_verts, dtype=float)
+    centers = np.asarray(tetraplex_4d_verts, dtype=float)
+    u = np.broadcast_to(centers[:, np.newaxis], cell_neighbors.shape+(4,))
+    n = centers[cell_neighbors]
+    cos = np.sum(u*n, axis=-1)[..., np.newaxis, np.newaxis]
+    w = n-cos[..., 0]*u
+    w /= np.linalg.norm(w, axis=-1, keepdims=True)
+    uu, ww = np.einsum('...i,...j->...ij', u, u), np.einsum('...i,...j->...ij', w, w)
+    wu = np.einsum('...i,...j->...ij', w, u)
+    guess = (uu+ww)*(1+cos)-np.eye(4)+np.sqrt(1-cos**2)*(wu-wu.swapaxes(-1, -2))
+
+    origin_points = verts[cell_verts][:, np.newaxis]
+    adjacent_points = verts[cell_verts[cell_neighbors]]
+    moved = adjacent_points@guess
+    seperations = np.linalg.norm(moved[..., :, np.newaxis, :]-origin_points[..., np.newaxis, :, :], axis=-1)
+    matches = np.take_along_axis(origin_points, np.argmin(seperations, axis=-1)[..., np.newaxis], axis=-2)
+    assert np.allclose(np.min(seperations, axis=-1), 0, atol=1e-6)
+
+    U, _, Vt = np.linalg.svd(adjacent_points.swapaxes(-1, -2)@matches)
+    return U@Vt
+
+def test_import_budget():
+    # The geometry core needs only numpy: plotting, svg and shader packages load on first use.
+    import subprocess
+    probe = ("import sys, time, numpy; start = time.perf_counter(); import fourdsolids; "
+             f"print(time.perf_counter()-start, *sorted(set(sys.modules) & {HEAVY_MODULES!r}))")
+    env = {k: v for k, v in os.environ.items() if not k.startswith('DODECAPLEX_PROFILE')}
+    runs = [subprocess.run([sys.executable, '-c', probe], cwd=os.path.dirname(os.path.abspath(__file__)),
+                           env=env, capture_output=True, text=True, check=True).stdout.split() for _ in range(3)]
+    assert all(len(run) == 1 for run in runs), runs
+    assert min(float(run[0]) for run in runs) < IMPORT_BUDGET
+
+def test_cell_incidence():
+    d4vs, t4vs = gen_dodecaplex_vertices(), gen_tetraplex_vertices()
+    cell_verts, vertex_cells = get_cell_incidence(d4vs, t4vs)
+    assert cell_verts.shape == (120, 20) and vertex_cells.shape == (600, 4)
+    for v, cells in enumerate(vertex_cells):
+        assert all(v in cell_verts[c] for c in cells)
+    seperations = np.linalg.norm(np.array(d4vs)[cell_verts]-np.array(t4vs)[:, np.newaxis], axis=-1)
+    assert np.allclose(seperations, RADIUS_120CELL)
+    exact = get_cell_incidence(gen_dodecaplex_golden(), gen_tetraplex_golden())
+    assert np.array_equal(exact[0], cell_verts) and np.array_equal(exact[1], vertex_cells)
+    assert get_neighbor_map(gen_tetraplex_golden()) == get_neighbor_map(t4vs)
+
+def test_hop_distances():
+    neighbor_map = get_neighbor_map(gen_tetraplex_vertices())
+    distances = get_hop_distances(neighbor_map)
+    assert np.array_equal(distances, distances.T) and np.all(np.diag(distances) == 0)
+    assert all(np.all(distances[cell, list(neighbors)] == 1) for cell, neighbors in neighbor_map.items())
+    assert np.all(np.sort(distances, axis=1) == np.repeat(np.arange(6), [1, 12, 32, 42, 32, 1]))
+
+def test_face_neighbors():
+    t4vs = gen_tetraplex_vertices()
+    cell_verts, _ = get_cell_incidence(gen_dodecaplex_vertices(), t4vs)
+    neighbor_map = get_neighbor_map(t4vs)
+    cell_neighbors = np.array([neighbor_map[i] for i in range(len(t4vs))])
+    cell_faces = get_cell_faces(cell_verts, cell_neighbors)
+    shuffle = np.random.default_rng(0).permuted(np.tile(np.arange(12), (120, 1)), axis=1)
+    shuffled_faces = np.take_along_axis(cell_faces, shuffle[..., np.newaxis], axis=1)[..., ::-1]
+    assert np.array_equal(get_face_neighbors(shuffled_faces), np.take_along_axis(cell_neighbors, shuffle, axis=1))
+
+def test_cell_pentagons():
+    d4vs, t4vs = gen_dodecaplex_vertices(), gen_tetraplex_vertices()
+    cell_verts, _ = get_cell_incidence(d4vs, t4vs)
+    neighbor_map = get_neighbor_map(t4vs)
+    cell_neighbors = np.array([neighbor_map[i] for i in range(len(t4vs))])
+    pentagons = get_cell_pentagons(d4vs, t4vs, get_cell_faces(cell_verts, cell_neighbors))
+    assert np.array_equal(pentagons, get_cell_pentagons(d4vs, t4vs, pentagons[..., ::-1]))
+    points = np.array(d4vs)[pentagons]
+    assert np.allclose(np.linalg.norm(points-np.roll(points, 1, axis=-2), axis=-1), EDGE_120CELL)
+    directed = np.stack((pentagons, np.roll(pentagons, -1, axis=-1)), axis=-1).reshape(120, 60, 2)
+    assert all(len({*map(tuple, cell)}) == 60 and len({tuple(sorted(e)) for e in cell.tolist()}) == 30 for cell in directed)
+    interior, exterior, adjacent = get_face_adjacency(pentagons)
+    assert interior.shape == (1440, 5) and exterior.shape == (1440, 5) and adjacent.shape == (1440, 10)
+    assert np.all(interior//12 == np.arange(1440)[:, np.newaxis]//12)
+    assert np.all(exterior//12 == cell_neighbors.reshape(-1, 1))
+
+def test_neighbor_transforms():
+    d4vs, t4vs = np.array(gen_dodecaplex_vertices()), np.array(gen_tetraplex_vertices())
+    cell_verts, _ = get_cell_incidence(d4vs, t4vs)
+    neighbor_map = get_neighbor_map(t4vs)
+    cell_neighbors = np.array([neighbor_map[i] for i in range(len(t4vs))])
+    transforms = get_neighbor_transforms(d4vs, t4vs, cell_verts, cell_neighbors)
+    assert transforms.shape == (120, 12, 4, 4)
+    assert np.allclose(transforms@transforms.swapaxes(-1, -2), np.eye(4))
+    assert np.allclose(np.einsum('cni,cnij->cnj', t4vs[cell_neighbors], transforms), t4vs[:, np.newaxis])
+    moved = np.sort(np.round(d4vs[cell_verts[cell_neighbors]]@transforms, 6), axis=-2)
+    assert np.allclose(moved, np.sort(np.round(d4vs[cell_verts], 6), axis=-2)[:, np.newaxis])
 
 if __name__ == "__main__":
-    test_initialization()
\ No newline at end of file
+    test_initialization()
+    test_golden_vertices()
+    test_import_budget()
+    test_cell_incidence()
+    test_hop_distances()
+    test_face_neighbors()
+    test_cell_pentagons()
+    test_neighbor_transforms()
@@ -0,0 +1,122 @@
+import numpy as np
+from neighbors import pairs_to_csr
+
+__all__ = ['PHI', 'GOLDEN', 'GOLDEN_TABLE', 'golden', 'neg', 'add', 'sub', 'mul', 'total', 'dot',
+    'norm2', 'equal', 'to_float', 'to_cpp', 'to_str', 'pairs_at_distance']
+
+PHI = (1+(5**0.5))/2
+
+# Exact element (a + b*PHI)/d of Q(√5), kept normalized: d > 0 and gcd(a, b, d) == 1,
+# so equal values have equal bytes and hash, sort and np.unique exactly.
+GOLDEN = np.dtype([('a', np.int64), ('b', np.int64), ('d', np.int64)])
+
+GOLDEN_TABLE = (
+    #  (a, b, d)    float           C++ literal         display
+    ((0, 0, 1),     0,              '0.0f',             '0'),
+    ((1, 0, 1),     1,              '1.0f',             '1'),
+    ((2, 0, 1),     2.0,            '2.0f',             '2'),
+    ((1, 0, 2),     0.5,            '0.5f',             '1/2'),
+    ((0, 1, 1),     PHI,            'PHI',              'Φ'),
+    ((1, 1, 1),     PHI*PHI,        'PHI*PHI',          'Φ²'),
+    ((-1, 1, 1),    1/PHI,          '1.0f/PHI',         '1/Φ'),
+    ((2, -1, 1),    PHI**(-2),      '1.0f/(PHI*PHI)',   '1/Φ²'),
+    ((-1, 2, 1),    5**0.5,         'ROOT_FIVE',        '√5'),
+    ((0, 1, 2),     0.5*PHI,        'PHI/2.0f',         'Φ/2'),
+    ((-1, 1, 2),    0.5/PHI,        '1.0f/(2.0f*PHI)',  '1/2Φ'),
+)   # the float column is the exact double the seed points have always been written with
+
+def _normalized(a, b, d):
+    a, b, d = np.broadcast_arrays(*(np.asarray(x, dtype=np.int64) for x in (a, b, d)))
+    g = np.gcd(np.gcd(a, b), d)*np.sign(d)
+    out = np.empty(a.shape, dtype=GOLDEN)
+    out['a'], out['b'], out['d'] = a//g, b//g, d//g
+    return out
+
+def golden(a, b=0, d=1):
+    return _normalized(a, b, d)
+
+def neg(x):
+    return _normalized(-x['a'], -x['b'], x['d'])
+
+def add(x, y):
+    return _normalized(x['a']*y['d']+y['a']*x['d'], x['b']*y['d']+y['b']*x['d'], x['d']*y['d'])
+
+def sub(x, y):
+    return add(x, neg(y))
+
+def mul(x, y):
+    # PHI**2 == 1 + PHI
+    bb = x['b']*y['b']
+    return _normalized(x['a']*y['a']+bb, x['a']*y['b']+x['b']*y['a']+bb, x['d']*y['d'])
+
+def total(x, axis=-1):
+    d = np.lcm.reduce(x['d'], axis=axis, keepdims=True)
+    return _normalized((x['a']*(d//x['d'])).sum(axis=axis), (x['b']*(d//x['d'])).sum(axis=axis), d.squeeze(axis))
+
+def dot(x, y, axis=-1):
+    return total(mul(x, y), axis=axis)
+
+def norm2(x, axis=-1):
+    return dot(x, x, axis=axis)
+
+def equal(x, y):
+    return (x['a'] == y['a']) & (x['b'] == y['b']) & (x['d'] == y['d'])
+
+def _table_lookup(x):
+    # Index into GOLDEN_TABLE of x or -x (-1 when neither is listed) and the sign that matched.
+    keys = _normalized(*zip(*(key for key, *_ in GOLDEN_TABLE)))
+    positive = equal(x[..., np.newaxis], keys)
+    negative = equal(x[..., np.newaxis], neg(keys))
+    index = np.where(positive.any(axis=-1), positive.argmax(axis=-1),
+                     np.where(negative.any(axis=-1), negative.argmax(axis=-1), -1))
+    return index, np.where(positive.any(axis=-1), 1, -1)
+
+def to_float(x):
+    index, sign = _table_lookup(x)
+    floats = np.array([float(value) for _, value, *_ in GOLDEN_TABLE])
+    return np.where(index >= 0, sign*floats[index], (x['a']+x['b']*PHI)/x['d'])+0.0
+
+def _literals(x, column, width):
+    index, sign = _table_lookup(x)
+    names = np.array([row[column] for row in GOLDEN_TABLE])
+    marks = np.where(sign < 0, '-', ' ')
+    out = np.char.rjust(np.char.add(marks, names[index]), width).astype(object)
+    for at in map(tuple, np.argwhere(index < 0)):
+        value = float(to_float(x[at]))
+        out[at] = (' ' if value >= 0 else '-')+str(abs(value))
+    return out
+
+def to_cpp(x):
+    return _literals(x, 2, 16)
+
+def to_str(x):
+    return _literals(x, 3, 5)
+
+def pairs_at_distance(points, squared_distance, others=None):
+    """
+    Exact counterpart of neighbors.neighbor_csr for GOLDEN points: pairs
+    whose squared separation equals squared_distance, as CSR adjacency.
+    """
+    same = others is None
+    others = points if same else others
+    seperations = norm2(sub(points[:, np.newaxis], others[np.newaxis, :]))
+    rows, cols = np.nonzero(equal(seperations, squared_distance))
+    if same:
+        rows, cols = rows[rows != cols], cols[rows != cols]
+    return pairs_to_csr(rows, cols, len(points))
+
+def test_arithmetic():
+    x = golden([0, 2, -1, 1], [1, -1, 2, 1], [1, 1, 1, 2])
+    assert np.allclose(to_float(add(x, x)), 2*to_float(x))
+    assert np.allclose(to_float(mul(x, x)), to_float(x)**2)
+    assert np.array_equal(mul(golden(0, 1), golden(-1, 1)), golden(1))       # PHI * 1/PHI
+    assert np.array_equal(mul(golden(-1, 2), golden(-1, 2)), golden(5))      # √5 squared
+    assert equal(norm2(x), add(add(mul(x[0], x[0]), mul(x[1], x[1])), add(mul(x[2], x[2]), mul(x[3], x[3]))))
+    assert np.unique(golden([1, 2, -2], [1, 2, -2], [2, 4, -4])).size == 1
+    for (key, value, cpp, text) in GOLDEN_TABLE:
+        assert to_float(golden(*key)) == value and to_float(neg(golden(*key))) == -value
+        assert to_cpp(golden(*key)).item().strip() == cpp and to_str(golden(*key)).item().strip() == text
+    assert to_cpp(golden(3, 0, 7)).item() == ' '+str(3/7)
+
+if __name__ == "__main__":
+    test_arithmetic()
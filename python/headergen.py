@@ -0,0 +1,358 @@
+import os
+import sys
+import json
+import hashlib
+import inspect
+import argparse
+import tempfile
+from functools import lru_cache, partial
+import numpy as np
+import mathhelpers
+import golden as golden_field
+from golden import to_cpp
+import fourdsolids
+from fourdsolids import *
+from topocache import load_topology
+from coxeter import POLYTOPES, wythoff, header_topology
+import stagetimer
+from stagetimer import stage, count
+
+DEFAULT_SECTIONS = ('cells', 'neighbors', 'interior', 'exterior', 'adjacent')
+COPY_CHUNK = 2**16
+
+def _format_shared(format_block, name, shape, dtype, start, stop):
+    from multiprocessing import shared_memory
+    shared = shared_memory.SharedMemory(name=name)
+    rows = np.ndarray(shape, dtype=dtype, buffer=shared.buf)
+    try:
+        return format_block(rows[start:stop], start)
+    finally:
+        del rows
+        shared.close()
+
+class BlockFormatter:
+    """
+    Formats an array as contiguous row blocks, in worker processes reading
+    it from shared memory when jobs > 1. Blocks come back in row order, so
+    the text is identical for any number of jobs.
+    """
+    def __init__(self, jobs=1):
+        self.jobs = jobs
+        self.pool = None
+        if jobs > 1:
+            from concurrent.futures import ProcessPoolExecutor
+            self.pool = ProcessPoolExecutor(jobs)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        if self.pool is not None:
+            self.pool.shutdown()
+
+    def blocks(self, format_block, rows):
+        rows = np.ascontiguousarray(rows)
+        if self.pool is None or len(rows) < 2:
+            return [format_block(rows, 0)]
+        bounds = np.linspace(0, len(rows), min(self.jobs, len(rows))+1).astype(int).tolist()
+        from multiprocessing import shared_memory
+        shared = shared_memory.SharedMemory(create=True, size=rows.nbytes)
+        try:
+            np.ndarray(rows.shape, dtype=rows.dtype, buffer=shared.buf)[...] = rows
+            futures = [self.pool.submit(_format_shared, format_block, shared.name, rows.shape, rows.dtype, a, b)
+                for a, b in zip(bounds[:-1], bounds[1:])]
+            return [future.result() for future in futures]
+        finally:
+            shared.close()
+            shared.unlink()
+
+SERIAL = BlockFormatter()
+
+def _joined(separator, chunks):
+    for i, chunk in enumerate(chunks):
+        if i: yield separator
+        yield chunk
+
+def format_table_block(rows, start):
+    return ',\n'.join(str(row).strip('[]') for row in rows.tolist())
+
+def format_cell_block(cell_faces, start):
+    def format_indeces(pentagons):
+        out_str = ''
+        for i, face in enumerate(pentagons):
+            if i%4 == 0:
+                out_str+= '\n'
+            tri_str = ', '.join(map(str, face))+",\t\t"
+            gap = " "*(15 - len(tri_str))
+            out_str += gap+tri_str
+        return out_str
+    return '\n'.join(f'//------Cell {start+i}------{format_indeces(x)}' for i, x in enumerate(cell_faces.tolist()))
+
+def format_vertex_block(vertices, start):
+    return '\n'.join(', '.join(v)+',' for v in to_cpp(vertices).tolist())
+
+def emit_cells(cell_faces, formatter=SERIAL):
+    yield '\n'
+    yield from _joined('\n', formatter.blocks(format_cell_block, cell_faces))
+
+def emit_neighbors(cell_faces, formatter=SERIAL):
+    yield from _joined(',\n', formatter.blocks(format_table_block, get_face_neighbors(cell_faces)))
+
+def emit_interior(face_adjacency, formatter=SERIAL):
+    yield 'interior\n'
+    yield from _joined(',\n', formatter.blocks(format_table_block, face_adjacency()[0]))
+
+def emit_exterior(face_adjacency, formatter=SERIAL):
+    yield 'exterior\n'
+    yield from _joined(',\n', formatter.blocks(format_table_block, face_adjacency()[1]))
+
+def emit_adjacent(face_adjacency, formatter=SERIAL):
+    yield 'adjacent\n'
+    yield from _joined(',\n', formatter.blocks(format_table_block, face_adjacency()[2]))
+
+def emit_vertices(dodecaplex_golden, formatter=SERIAL):
+    yield from _joined('\n', formatter.blocks(format_vertex_block, dodecaplex_golden))
+
+def emit_axes(tetraplex_golden, cell_neighbors, formatter=SERIAL):
+    yield '\n'
+    yield from _joined('\n', (f"glm::vec4({','.join(axis)})" for axis in to_cpp(tetraplex_golden[cell_neighbors[0]]).tolist()))
+
+def format_matrix_block(matrices, start):
+    return '\n'.join('{'+','.join(['{0:0.8f}'.format(f).rstrip('0').rstrip('.') for f in value.flat])+'}'
+        for value in np.round(matrices, 8)+0.0)
+
+def emit_matrices(neighbor_transforms, formatter=SERIAL):
+    yield '\n'
+    yield format_matrix_block(neighbor_transforms[0], 0)
+
+def emit_transforms(neighbor_transforms, formatter=SERIAL):
+    yield '\n'
+    yield from _joined('\n', formatter.blocks(format_matrix_block, np.reshape(neighbor_transforms, (-1, 4, 4))))
+
+SECTIONS = {
+    'cells':        (emit_cells,        ('cell_faces',)),
+    'neighbors':    (emit_neighbors,    ('cell_faces',)),
+    'interior':     (emit_interior,     ('face_adjacency',)),
+    'exterior':     (emit_exterior,     ('face_adjacency',)),
+    'adjacent':     (emit_adjacent,     ('face_adjacency',)),
+    'vertices':     (emit_vertices,     ('dodecaplex_golden',)),
+    'axes':         (emit_axes,         ('tetraplex_golden', 'cell_neighbors')),
+    'matrices':     (emit_matrices,     ('neighbor_transforms',)),
+    'transforms':   (emit_transforms,   ('neighbor_transforms',)),
+}
+
+# Tables derived from topology fields. Emitters get them as a callable building them at most
+# once per write, and only when a stale section reads them; they are hashed by their inputs.
+DERIVED = {
+    'face_adjacency':   (get_face_adjacency,    ('cell_faces',)),
+}
+
+def _input_hash(emit, arrays):
+    # Emitter source, the code it formats and derives tables with, and the arrays it reads.
+    key = hashlib.sha256(inspect.getsource(emit).encode())
+    for code in (_joined, format_table_block, format_cell_block, format_vertex_block, format_matrix_block,
+                 mathhelpers, golden_field, fourdsolids):
+        key.update(inspect.getsource(code).encode())
+    for array in arrays:
+        array = np.ascontiguousarray(array)
+        key.update(str((array.dtype.str, array.shape)).encode())
+        key.update(array.tobytes())
+    return key.hexdigest()
+
+def _file_hash(path):
+    key = hashlib.sha256()
+    with open(path, 'rb') as existing:
+        for chunk in iter(lambda: existing.read(COPY_CHUNK), b''):
+            key.update(chunk)
+    return key.hexdigest()
+
+def _load_manifest(path):
+    # Sections recorded for path, only if the file is still the one they were recorded for.
+    try:
+        with open(path+'.sections.json') as manifest_file:
+            manifest = json.load(manifest_file)
+        if manifest['digest'] == _file_hash(path):
+            return {entry['name']: entry for entry in manifest['sections']}
+    except (OSError, ValueError, KeyError):
+        pass
+    return {}
+
+def write_sections(path, sections, check=False):
+    """
+    Streams (name, input_hash, chunks) sections into path, copying the bytes
+    of any section whose input hash matches the previous run instead of
+    emitting it again. The file is only replaced when its content changes.
+    Returns the names of the sections that were (or, with check, would be)
+    rewritten: regenerated ones, those moved to another place in the file,
+    then those no longer in it.
+    """
+    previous = _load_manifest(path)
+    stale = [name for name, inputs, _ in sections if previous.get(name, {}).get('inputs') != inputs]
+    names, layout = [name for name, _, _ in sections], list(previous)
+    moved = [name for i, name in enumerate(names) if i >= len(layout) or layout[i] != name]
+    changed = [name for name in names if name in stale or name in moved]+[name for name in layout if name not in names]
+    if check or not changed:
+        return changed
+
+    entries, digest = [], hashlib.sha256()
+    def copy(chunks, staging):
+        for chunk in chunks:
+            digest.update(chunk)
+            staging.write(chunk)
+    def reuse(existing, entry):
+        existing.seek(entry['offset'])
+        remaining = entry['length']
+        while remaining:
+            chunk = existing.read(min(COPY_CHUNK, remaining))
+            remaining -= len(chunk)
+            yield chunk
+
+    existing = open(path, 'rb') if previous else None
+    staging = tempfile.NamedTemporaryFile('wb', dir=os.path.dirname(os.path.abspath(path)), delete=False)
+    with staging:
+        for name, inputs, chunks in sections:
+            offset = staging.tell()
+            with stage('section.'+name):
+                if name in stale:
+                    copy((chunk.encode() for chunk in chunks), staging)
+                else:
+                    copy(reuse(existing, previous[name]), staging)
+            count('sections.regenerated' if name in stale else 'sections.reused')
+            entries.append({'name': name, 'inputs': inputs, 'offset': offset, 'length': staging.tell()-offset})
+    if existing:
+        existing.close()
+
+    if os.path.exists(path) and _file_hash(path) == digest.hexdigest():
+        os.remove(staging.name)
+    else:
+        os.replace(staging.name, path)
+    with open(path+'.sections.json', 'w') as manifest_file:
+        json.dump({'digest': digest.hexdigest(), 'sections': entries}, manifest_file, indent=1)
+    return changed
+
+def write_declarations(topology=None, path='dodecaplex.h', sections=DEFAULT_SECTIONS, check=False, jobs=1):
+    with stage('write_declarations'):
+        with stage('load_topology'):
+            topology = load_topology() if topology is None else topology
+        derived = {name: lru_cache(maxsize=None)(partial(build, *[topology[i] for i in inputs]))
+                   for name, (build, inputs) in DERIVED.items()}
+        with BlockFormatter(jobs) as formatter:
+            planned = []
+            with stage('input_hashes'):
+                for name in sections:
+                    emit, input_names = SECTIONS[name]
+                    arrays = [topology[j] for i in input_names for j in (DERIVED[i][1] if i in DERIVED else (i,))]
+                    inputs = [derived[i] if i in DERIVED else topology[i] for i in input_names]
+                    planned.append((name, _input_hash(emit, arrays), emit(*inputs, formatter=formatter)))
+            return write_sections(path, planned, check=check)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Regenerate the dodecaplex.h index tables.')
+    parser.add_argument('--output', default='dodecaplex.h')
+    parser.add_argument('--sections', nargs='+', choices=SECTIONS, default=DEFAULT_SECTIONS)
+    parser.add_argument('--check', action='store_true', help='report stale sections without writing')
+    parser.add_argument('--jobs', type=int, default=1, help='worker processes formatting the tables')
+    parser.add_argument('--polytope', choices=POLYTOPES,
+                        help='cell tables of this Wythoff polytope instead of the dodecaplex')
+    parser.add_argument('--profile', nargs='?', const='', metavar='REPORT',
+                        help='time every stage and write the report as JSON to REPORT (stderr if omitted)')
+    parser.add_argument('--profile-stage', metavar='STAGE', help='with --profile, dump STAGE.prof from cProfile')
+    args = parser.parse_args(argv)
+    topology = None
+    if args.polytope:
+        if set(args.sections)-set(DEFAULT_SECTIONS):
+            parser.error(f'--polytope only writes the {", ".join(DEFAULT_SECTIONS)} sections')
+        try:
+            topology = header_topology(wythoff(*POLYTOPES[args.polytope]))
+        except ValueError as error:
+            parser.error(f'--polytope {args.polytope}: {error}')
+    if args.profile is not None:
+        stagetimer.enable(profile_stage=args.profile_stage)
+    stale = write_declarations(topology, args.output, args.sections, check=args.check, jobs=args.jobs)
+    for name in stale:
+        print(f"{'stale' if args.check else 'regenerated'}: {name}")
+    if args.profile is not None:
+        stagetimer.write_report(args.profile or None)
+    return 1 if args.check and stale else 0
+
+def test_incremental():
+    topology = load_topology()
+    with tempfile.TemporaryDirectory() as out_dir:
+        path = os.path.join(out_dir, 'dodecaplex.h')
+        assert write_declarations(topology, path) == list(DEFAULT_SECTIONS)
+        with open(path, 'rb') as first:
+            expected = first.read()
+        stamp = os.stat(path).st_mtime_ns
+        assert write_declarations(topology, path) == []
+        assert write_declarations(topology, path, check=True) == []
+        assert os.stat(path).st_mtime_ns == stamp
+
+        with open(path+'.sections.json') as manifest_file:
+            manifest = json.load(manifest_file)
+        manifest['sections'][2]['inputs'] = 'outdated'
+        with open(path+'.sections.json', 'w') as manifest_file:
+            json.dump(manifest, manifest_file)
+        assert write_declarations(topology, path, check=True) == ['interior']
+        assert write_declarations(topology, path) == ['interior']
+        assert os.stat(path).st_mtime_ns == stamp
+
+        with open(path, 'ab') as edited:
+            edited.write(b'//')
+        assert write_declarations(topology, path) == list(DEFAULT_SECTIONS)
+        with open(path, 'rb') as rewritten:
+            assert rewritten.read() == expected
+
+        assert write_declarations(topology, path, DEFAULT_SECTIONS+('vertices',)) == ['vertices']
+        assert write_declarations(topology, path, check=True) == ['vertices']
+        assert write_declarations(topology, path) == ['vertices']
+        with open(path, 'rb') as rewritten:
+            assert rewritten.read() == expected
+        swapped = ('neighbors', 'cells')+DEFAULT_SECTIONS[2:]
+        assert write_declarations(topology, path, swapped, check=True) == ['neighbors', 'cells']
+        assert main(['--output', path, '--check', '--sections', *swapped]) == 1
+
+def test_derived_once():
+    topology = load_topology()
+    stagetimer.reset()
+    stagetimer.enable(memory=False)
+    try:
+        with tempfile.TemporaryDirectory() as out_dir:
+            path = os.path.join(out_dir, 'dodecaplex.h')
+            write_declarations(topology, path)
+            assert stagetimer.report()['stages']['get_face_adjacency']['calls'] == 1
+            write_declarations(topology, path)
+            assert stagetimer.report()['stages']['get_face_adjacency']['calls'] == 1
+    finally:
+        stagetimer.disable()
+        stagetimer.reset()
+
+def test_jobs_identical():
+    topology = load_topology()
+    with tempfile.TemporaryDirectory() as out_dir:
+        outputs = []
+        for jobs in (1, 3):
+            path = os.path.join(out_dir, f'dodecaplex_{jobs}.h')
+            write_declarations(topology, path, sections=tuple(SECTIONS), jobs=jobs)
+            with open(path, 'rb') as written:
+                outputs.append(written.read())
+        assert outputs[0] == outputs[1]
+
+def test_polytope_tables():
+    dodecaplex = load_topology()
+    with tempfile.TemporaryDirectory() as out_dir:
+        lines = {}
+        for name, topology in (('dodecaplex', dodecaplex), ('120-cell', header_topology(wythoff(*POLYTOPES['120-cell']))),
+                               ('tesseract', header_topology(wythoff(*POLYTOPES['tesseract'])))):
+            path = os.path.join(out_dir, name+'.h')
+            assert write_declarations(topology, path) == list(DEFAULT_SECTIONS)
+            with open(path) as header:
+                lines[name] = header.read().count('\n')
+        assert lines['120-cell'] == lines['dodecaplex'] and 0 < lines['tesseract'] < lines['dodecaplex']
+        try:
+            main(['--output', os.path.join(out_dir, 'demitesseract.h'), '--polytope', 'demitesseract'])
+            assert False
+        except SystemExit as exit:
+            assert exit.code == 2
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,76 +1,116 @@
 import numpy as np
-import matplotlib
 from math import isclose
-from sympy.utilities.iterables import multiset_permutations
+from functools import lru_cache
+from itertools import permutations, product
+from golden import GOLDEN, to_float
 
-class NamedFloat(float):
-    def __new__(cls, value, name=None):
-        obj = super().__new__(cls, value)
-        obj.name = name  # Add a custom attribute
-        return obj
-
-    def __repr__(self):
-        return self.name
+__all__ = ['are_close', 'OFFSET_DIMENSIONS', 'tolerant_unique', 'SIGN_TABLE', 'PERMUTATION_TABLE',
+    'EVEN_PERMUTATION_TABLE', 'signed_permutations', 'golden_signed_permutations', 'mat_180_around',
+    'vector_to_rgb']
 
 def are_close(t1, t2, tol=1e-4):
     return all(isclose(x, y, abs_tol=tol) for x, y in zip(t1, t2))
 
-def calculate_parity(permutation):
-    inversions = 0
-    n = len(permutation)
-    for i in range(n):
-        for j in range(i + 1, n):
-            if permutation[i] > permutation[j]:
-                inversions += 1
-    return inversions % 2 == 0
-
-def unsigned_permutations(vert, even=False):
-    a,b,c,d = vert
-    all_permutations = []
-    for x in range(2**4):
-        binary = bin(x)
-        binary = '0000'+binary.replace('b', '')
-        
-        sign_permutation = [a*(-1)**(int(binary[-1])+1), b*(-1)**(int(binary[-2])+1), 
-                            c*(-1)**(int(binary[-3])+1), d*(-1)**(int(binary[-4])+1)]
-        these_permutations = []
-        for index_perm in multiset_permutations(list(range(4))):
-            if calculate_parity(index_perm) or not even:
-                these_permutations.append(tuple(sign_permutation[i] for i in index_perm))
-        all_permutations.extend(set(these_permutations))
-    return {*all_permutations}
-
-def get_str_repr(v):
-    o = ' ' if v >= 0 else '-'
-    v = abs(v)
-    if   v == 1.618033988749895:    return f'   {o}Φ'
-    elif v == 0.38196601125010515:  return f'{o}1/Φ²'
-    elif v == 2.23606797749979:     return f'  {o}√5'
-    elif v == 0.6180339887498948:   return f' {o}1/Φ'
-    elif v == 2.618033988749895:    return f'  {o}Φ²'
-    elif v == 0.3090169943749474:   return f'{o}1/2Φ'
-    elif v == 0.8090169943749475:   return f' {o}Φ/2'
-    elif v == 1:                    return f'   {o}1'
-    elif v == 0:                    return f'   {o}0'
-    elif v == 0.5:                  return f' {o}1/2'
-    elif v == 2.0:                  return f'   {o}2'
-    else: return o+str(v)
-
-def get_cpp_repr(v):
-    o = ' ' if v >= 0 else '-'
-    v = abs(v)
-    if   v == 1.618033988749895:    return f'            {o}PHI'
-    elif v == 0.38196601125010515:  return f' {o}1.0f/(PHI*PHI)'
-    elif v == 2.23606797749979:     return f'      {o}ROOT_FIVE'
-    elif v == 0.6180339887498948:   return f'       {o}1.0f/PHI'
-    elif v == 2.618033988749895:    return f'        {o}PHI*PHI'
-    elif v == 0.3090169943749474:   return f'{o}1.0f/(2.0f*PHI)'
-    elif v == 0.8090169943749475:   return f'       {o}PHI/2.0f'
-    elif v == 1:                    return f'           {o}1.0f'
-    elif v == 0:                    return f'           {o}0.0f'
-    elif v == 0.5:                  return f'           {o}0.5f'
-    elif v == 2.0:                  return f'           {o}2.0f'
-    else: return o+str(v)
+OFFSET_DIMENSIONS = 6
+
+def _lookup_rows(keys, queries):
+    # Index in keys of every row of queries, -1 where it is absent; keys rows are unique.
+    _, ids = np.unique(np.concatenate((keys, queries)), axis=0, return_inverse=True)
+    ids = ids.ravel()
+    position = np.full(len(keys)+len(queries), -1)
+    position[ids[:len(keys)]] = np.arange(len(keys))
+    return position[ids[len(keys):]]
+
+def tolerant_unique(points, tol=1e-4):
+    """
+    Groups of near-equal rows of (N, d) points: rows are bucketed on a grid
+    of step tol and buckets merged with adjacent ones whose first rows are
+    within tol in every coordinate. Merging chains, so rows then more than
+    tol from their group's first row are split off and grouped again the
+    same way: every row is are_close to its group's first row. Returns the
+    first row of every group in order of appearance, the group of every
+    row, and the group sizes.
+    """
+    points = np.asarray(points, dtype=float)
+    flat = points.reshape(len(points), int(np.prod(points.shape[1:])))
+    buckets, first, bucket_of = np.unique(np.floor(flat/tol).astype(np.int64), axis=0,
+                                          return_index=True, return_inverse=True)
+    bucket_of = bucket_of.ravel()
+
+    if flat.shape[1] <= OFFSET_DIMENSIONS:
+        pairs = []
+        for offset in product((-1, 0, 1), repeat=flat.shape[1]):
+            if offset <= (0,)*len(offset):   # each adjacent pair once
+                continue
+            other = _lookup_rows(buckets, buckets+offset)
+            found = np.nonzero(other >= 0)[0]
+            pairs.append(np.stack((found, other[found])))
+        a, b = np.concatenate(pairs, axis=1) if pairs else np.zeros((2, 0), dtype=int)
+        close = np.all(np.abs(flat[first[a]]-flat[first[b]]) <= tol, axis=1)
+        a, b = a[close], b[close]
+    else:
+        # 3**d adjacent buckets are too many to probe: pair up the buckets' first rows by tree instead
+        from scipy.spatial import cKDTree
+        a, b = cKDTree(flat[first]).query_pairs(tol, p=np.inf, output_type='ndarray').reshape(-1, 2).T
+
+    label = np.arange(len(buckets))
+    while True:
+        merged = label.copy()
+        np.minimum.at(merged, a, label[b])
+        np.minimum.at(merged, b, label[a])
+        merged = merged[merged]
+        if np.array_equal(merged, label):
+            break
+        label = merged
+
+    _, group_first, group_of = np.unique(label[bucket_of], return_index=True, return_inverse=True)
+    group_of = group_of.ravel()
+    far = np.nonzero(np.any(np.abs(flat-flat[group_first[group_of]]) > tol, axis=1))[0]
+    if len(far):    # never a group's first row, so this recursion shrinks
+        _, far_of, _ = tolerant_unique(flat[far], tol)
+        group_of[far] = len(group_first)+far_of
+        group_first = np.concatenate((group_first, far[np.unique(far_of, return_index=True)[1]]))
+    rank = np.empty(len(group_first), dtype=np.intp)
+    rank[np.argsort(group_first)] = np.arange(len(group_first))
+    inverse = rank[group_of]
+    return points[np.sort(group_first)], inverse, np.bincount(inverse)
+
+SIGN_TABLE = np.array([[1 if (x >> i) & 1 else -1 for i in range(4)] for x in range(2**4)])
+PERMUTATION_TABLE = np.array(list(permutations(range(4))))
+EVEN_PERMUTATION_TABLE = PERMUTATION_TABLE[
+    [sum(p[i] > p[j] for i in range(4) for j in range(i + 1, 4)) % 2 == 0 for p in PERMUTATION_TABLE]]
+
+@lru_cache(maxsize=None)
+def _seed_orbit(vert, even):
+    perms = EVEN_PERMUTATION_TABLE if even else PERMUTATION_TABLE
+    images = (np.array(vert, dtype=float)[np.newaxis, :]*SIGN_TABLE)[:, perms]
+    # Each sign block is deduped then the whole orbit is, as python sets: that
+    # iteration order is the vertex numbering baked into dodecaplex.h.
+    ordered = []
+    for block in images.tolist():
+        ordered.extend({*map(tuple, block)})
+    orbit = np.array([*{*ordered}]) + 0.0
+    orbit.setflags(write=False)
+    return orbit
+
+def signed_permutations(points, evens):
+    return np.concatenate([_seed_orbit(tuple(p), bool(e)) for p, e in zip(points, evens)])
+
+def golden_signed_permutations(points, evens):
+    """
+    signed_permutations of exact GOLDEN seed points, in the same order.
+    Signs and permutations map exactly onto the seeds' float images, so
+    each float orbit point picks out its exact counterpart by equality.
+    """
+    orbits = []
+    for seed, even in zip(points, evens):
+        perms = EVEN_PERMUTATION_TABLE if even else PERMUTATION_TABLE
+        images = np.empty((len(SIGN_TABLE), 4), dtype=GOLDEN)
+        images['a'], images['b'], images['d'] = seed['a']*SIGN_TABLE, seed['b']*SIGN_TABLE, seed['d']
+        images = images[:, perms].reshape(-1, 4)
+        exact = dict(zip(map(tuple, (to_float(images)+0.0).tolist()), images))
+        orbits.extend(exact[q] for q in map(tuple, _seed_orbit(tuple(to_float(seed).tolist()), bool(even)).tolist()))
+    return np.array(orbits, dtype=GOLDEN)
 
 def mat_180_around(invec3):
     invec3 = np.array(invec3)
@@ -82,5 +122,33 @@ def mat_180_around(invec3):
     ])
 
 def vector_to_rgb(disp):
+    from matplotlib.colors import hsv_to_rgb     # plotting only, kept off the geometry import path
     disp = disp/np.linalg.norm(disp)
-    return matplotlib.colors.hsv_to_rgb((disp[0]/2+.5, 1, 1))
\ No newline at end of file
+    return hsv_to_rgb((disp[0]/2+.5, 1, 1))
+
+def test_tolerant_unique():
+    rng = np.random.default_rng(0)
+    centers = rng.uniform(-3, 3, size=(50, 4))
+    picks = rng.integers(0, 50, size=2000)
+    points = centers[picks]+rng.uniform(-1e-5, 1e-5, size=(2000, 4))
+    unique, inverse, counts = tolerant_unique(points)
+    expected = []
+    for p in points:
+        if not any(are_close(p, u) for u in expected):
+            expected.append(p)
+    assert np.array_equal(unique, expected)
+    assert all(are_close(p, unique[i]) for p, i in zip(points, inverse))
+    assert counts.sum() == len(points) and np.array_equal(counts, np.bincount(inverse))
+    straddling = np.array([[0.99999e-4], [1.00001e-4], [5e-4]])
+    assert tolerant_unique(straddling)[1].tolist() == [0, 0, 1]
+    assert len(tolerant_unique(np.zeros((0, 3)))[0]) == 0
+    assert np.array_equal(tolerant_unique(np.tile(points, 3))[1], inverse)
+    chain = np.array([[0.99], [1], [2], [3], [4], [5]])*1e-4     # each within tol of the next
+    unique, inverse, _ = tolerant_unique(chain)
+    assert all(are_close(p, unique[i]) for p, i in zip(chain, inverse)) and len(unique) > 2
+    spread = rng.uniform(0, 1e-3, size=(500, 2))
+    unique, inverse, _ = tolerant_unique(spread)
+    assert np.all(np.abs(spread-unique[inverse]) <= 1e-4) and np.array_equal(unique, spread[np.sort(np.unique(inverse, return_index=True)[1])])
+
+if __name__ == "__main__":
+    test_tolerant_unique()
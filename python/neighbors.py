@@ -0,0 +1,62 @@
+import numpy as np
+
+DENSE_LIMIT = 2**20     # point pairs resolved through one dense distance matrix
+DEFAULT_TOL = 1e-6
+
+def _dense_pairs(points, others, distance, tol):
+    squared = (np.einsum('ij,ij->i', points, points)[:, np.newaxis]
+               + np.einsum('ij,ij->i', others, others)[np.newaxis, :]
+               - 2*points@others.T)
+    dists = np.sqrt(np.maximum(squared, 0))
+    return np.nonzero(np.abs(dists-distance) <= tol)
+
+def _tree_pairs(points, others, distance, tol):
+    from scipy.spatial import cKDTree
+    found = cKDTree(points).sparse_distance_matrix(
+        cKDTree(others), distance+tol, output_type='ndarray')
+    found = found[np.abs(found['v']-distance) <= tol]
+    return found['i'].astype(np.intp), found['j'].astype(np.intp)
+
+def neighbor_csr(points, distance, tol=DEFAULT_TOL, others=None, method=None):
+    """
+    All pairs (i, j) with |points[i] - others[j]| within tol of distance, as
+    CSR adjacency: the neighbors of i are indices[indptr[i]:indptr[i+1]],
+    sorted ascending. Without others, points are matched against themselves
+    and i is never its own neighbor.
+    """
+    points = np.asarray(points, dtype=float)
+    same = others is None
+    others = points if same else np.asarray(others, dtype=float)
+    if method is None:
+        method = 'dense' if len(points)*len(others) <= DENSE_LIMIT else 'tree'
+    pair_finder = {'dense': _dense_pairs, 'tree': _tree_pairs}[method]
+    rows, cols = pair_finder(points, others, distance, tol)
+    if same:
+        rows, cols = rows[rows != cols], cols[rows != cols]
+    return pairs_to_csr(rows, cols, len(points))
+
+def pairs_to_csr(rows, cols, n_rows):
+    order = np.lexsort((cols, rows))
+    indptr = np.zeros(n_rows+1, dtype=np.intp)
+    np.cumsum(np.bincount(rows, minlength=n_rows), out=indptr[1:])
+    return indptr, cols[order].astype(np.intp)
+
+def csr_sources(indptr):
+    # Row index of every entry of a CSR indices array.
+    return np.repeat(np.arange(len(indptr)-1), np.diff(indptr))
+
+def csr_rows(indptr, indices):
+    return [tuple(indices[a:b].tolist()) for a, b in zip(indptr[:-1], indptr[1:])]
+
+def test_paths_agree():
+    rng = np.random.default_rng(0)
+    points = np.round(rng.uniform(-2, 2, (400, 4))*4)/4
+    for distance in (0.25, 0.5, 1.0):
+        dense = neighbor_csr(points, distance, method='dense')
+        tree = neighbor_csr(points, distance, method='tree')
+        assert all(np.array_equal(a, b) for a, b in zip(dense, tree))
+        sources = csr_sources(dense[0])
+        assert np.allclose(np.linalg.norm(points[sources]-points[dense[1]], axis=1), distance)
+
+if __name__ == "__main__":
+    test_paths_agree()
@@ -0,0 +1,93 @@
+import tracemalloc
+from itertools import count, islice
+import numpy as np
+
+PERSPECTIVE_FOCUS = 5**0.5      # FOCUS in shaders/projection.vert
+DEFAULT_CHUNK = 256
+
+def plane_rotation(i, j, theta):
+    # 4x4 rotation by theta in the plane of coordinate axes i and j, acting on row vectors.
+    return plane_rotations(i, j, np.array([theta]))[0]
+
+def plane_rotations(i, j, thetas):
+    rotations = np.broadcast_to(np.eye(4), (len(thetas), 4, 4)).copy()
+    cos, sin = np.cos(thetas), np.sin(thetas)
+    rotations[:, i, i], rotations[:, j, j], rotations[:, i, j], rotations[:, j, i] = cos, cos, sin, -sin
+    return rotations
+
+def rotation_path(planes, step, frames=None, start=0, chunk=DEFAULT_CHUNK):
+    """
+    Yields the 4x4 rotation of every frame turning through planes, (i, j)
+    axis pairs each turned by step radians per frame, built chunk frames at
+    a time. frames=None never ends.
+    """
+    starts = count(start, chunk) if frames is None else range(start, start+frames, chunk)
+    for first in starts:
+        angles = np.arange(first, first+chunk if frames is None else min(first+chunk, start+frames))*step
+        rotations = np.broadcast_to(np.eye(4), (len(angles), 4, 4))
+        for i, j in planes:
+            rotations = rotations@plane_rotations(i, j, angles)
+        yield from rotations
+
+def orthographic(points):
+    return points[..., :3]
+
+def perspective(points, focus=PERSPECTIVE_FOCUS):
+    # What projection.vert does to every vertex after WORLD.
+    return points[..., :3]*(focus/(focus+points[..., 3:]))
+
+def stereographic(points, radius=None):
+    # From the pole (0, 0, 0, radius); radius defaults to each point's own.
+    radius = np.linalg.norm(points, axis=-1, keepdims=True) if radius is None else radius
+    return points[..., :3]*(radius/(radius-points[..., 3:]))
+
+PROJECTIONS = {
+    'orthographic':     orthographic,
+    'perspective':      perspective,
+    'stereographic':    stereographic,
+}
+
+def project_frames(vertices, rotations, projection='perspective', dims=3, chunk=DEFAULT_CHUNK):
+    """
+    Yields the (vertices, dims) projection of vertices@rotation for every
+    rotation in the iterable rotations, which may be endless. Rotations are
+    taken chunk at a time and transformed and projected as one (chunk,
+    vertices, 4) batch, so memory does not grow with the sequence. Frames
+    are views of that batch: copy any that must outlive the next chunk.
+    dims=2 drops the depth of the 3D projection.
+    """
+    vertices = np.asarray(vertices, dtype=float)
+    project = PROJECTIONS.get(projection, projection)
+    rotations = iter(rotations)
+    moved = np.empty((chunk,)+vertices.shape)
+    while True:
+        block = np.array(list(islice(rotations, chunk)), dtype=float).reshape(-1, 4, 4)
+        if not len(block):
+            return
+        projected = project(np.matmul(vertices, block, out=moved[:len(block)]))
+        yield from projected[..., :dims]
+
+def test_projections():
+    vertices = np.random.default_rng(0).normal(size=(600, 4))
+    path = list(rotation_path(((0, 3), (1, 2)), np.pi/90, frames=300, chunk=7))
+    assert len(path) == 300 and np.allclose(path[180], np.eye(4))
+    assert np.allclose(path[45], plane_rotation(0, 3, np.pi/2)@plane_rotation(1, 2, np.pi/2))
+    for name, project in PROJECTIONS.items():
+        expected = project(vertices@np.array(path))
+        frames = [frame.copy() for frame in project_frames(vertices, path, name, chunk=64)]
+        assert np.allclose(frames, expected)
+    frame = next(project_frames(vertices, path, dims=2))
+    assert np.allclose(frame, vertices[:, :2]*(5**0.5/(5**0.5+vertices[:, 3:])))
+
+    tracemalloc.start()
+    for i, _ in enumerate(project_frames(vertices, rotation_path(((0, 3),), 0.01), chunk=32)):
+        if i == 100:
+            tracemalloc.reset_peak()
+        if i == 5000:
+            break
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    assert peak < 4*32*vertices.nbytes
+
+if __name__ == "__main__":
+    test_projections()
@@ -0,0 +1,77 @@
+import os
+import random
+import tempfile
+import numpy as np
+import matplotlib.pyplot as plt
+from matplotlib.figure import Figure
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.collections import LineCollection
+from mpl_toolkits.mplot3d.art3d import Line3DCollection
+from neighbors import neighbor_csr, csr_sources
+
+__all__ = ['EDGE_PALETTE', 'edge_list', 'random_edge_colors', 'edge_segments', 'draw_edges',
+    'new_figure', 'finish']
+
+EDGE_PALETTE = ['red', 'green', 'blue', 'yellow', 'purple', 'cyan']
+
+def edge_list(vertices, distance, tol=0.01, min_degree=0):
+    """
+    (edges, 2) index pairs i < j of the vertices lying distance apart, each
+    edge once. Edges touching a vertex of degree below min_degree are dropped.
+    """
+    indptr, indices = neighbor_csr(vertices, distance, tol=tol)
+    degree = np.diff(indptr)
+    sources = csr_sources(indptr)
+    keep = (sources < indices) & (degree[sources] >= min_degree) & (degree[indices] >= min_degree)
+    return np.stack((sources[keep], indices[keep]), axis=-1)
+
+def random_edge_colors(edges, n_vertices, palette=EDGE_PALETTE):
+    # Every edge takes the color picked at random for its first vertex.
+    vertex_colors = np.array([random.choice(palette) for _ in range(n_vertices)])
+    return vertex_colors[edges[:, 0]] if len(edges) else vertex_colors[:0]
+
+def edge_segments(vertices, edges, dims=(0, 1, 2)):
+    return np.asarray(vertices, dtype=float)[:, dims][edges]
+
+def draw_edges(ax, vertices, edges, colors='red', dims=(0, 1, 2), **kwargs):
+    """
+    Adds every edge as one Line3DCollection (or LineCollection when dims
+    picks two coordinates) and returns it; colors is one color or one per edge.
+    """
+    segments = edge_segments(vertices, edges, dims)
+    collection = (Line3DCollection if len(dims) == 3 else LineCollection)(segments, colors=colors, **kwargs)
+    ax.add_collection(collection)
+    return collection
+
+def new_figure(output=None, figsize=(8, 8), headless=None):
+    # Figures saved to output, or headless ones, are drawn by Agg directly, without a window or pyplot state.
+    if not (output is not None if headless is None else headless):
+        return plt.figure(figsize=figsize)
+    fig = Figure(figsize=figsize)
+    FigureCanvasAgg(fig)
+    return fig
+
+def finish(fig, output=None, dpi=100):
+    if output is None:
+        plt.show()
+    else:
+        fig.savefig(output, dpi=dpi)
+
+def test_headless_png():
+    vertices = np.array([[0, 0, 0], [1, 0, 0], [1, 1, 0], [0, 1, 0], [0, 0, 1]], dtype=float)
+    edges = edge_list(vertices, 1)
+    assert edges.tolist() == [[0, 1], [0, 3], [0, 4], [1, 2], [2, 3]]
+    assert edge_list(vertices, 1, min_degree=2).tolist() == [[0, 1], [0, 3], [1, 2], [2, 3]]
+    with tempfile.TemporaryDirectory() as out_dir:
+        for dims in ((0, 1, 2), (0, 1)):
+            output = os.path.join(out_dir, f'edges_{len(dims)}d.png')
+            fig = new_figure(output)
+            ax = fig.add_subplot(projection='3d' if len(dims) == 3 else None)
+            collection = draw_edges(ax, vertices, edges, random_edge_colors(edges, len(vertices)), dims)
+            assert list(ax.collections) == [collection] and len(collection.get_colors()) == len(edges)
+            finish(fig, output)
+            with open(output, 'rb') as png:
+                assert png.read(8) == b'\x89PNG\r\n\x1a\n'
+
+if __name__ == "__main__":
+    test_headless_png()
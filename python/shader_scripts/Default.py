@@ -1,4 +1,9 @@
+import os
 import moderngl_window as mglw
+from shadersource import ShaderPipeline, UniformBindings
+from frametimes import FrameTimes, ENV_LOG
+
+UNIFORMS = ('u_resolution', 'u_scroll', 'u_time', 'u_mouse')
 
 class UniformImporter(mglw.WindowConfig):
     window_size = 1600, 900
@@ -7,36 +12,48 @@ class UniformImporter(mglw.WindowConfig):
     def __init__(self, **kwargs):
         super().__init__(**kwargs)
         self.u_scroll = 3.0
+        self.frame_times = FrameTimes()
         self.quad = mglw.geometry.quad_fs()
+        assert self.vertex_shader and self.fragment_shader
+        self.shaders = ShaderPipeline(self.ctx.program, self.resource_dir, \
+            vertex_shader=self.vertex_shader, fragment_shader=self.fragment_shader)
+        self.shaders.watch()
         self.establish_shader()
 
     def establish_shader(self):
-        assert self.vertex_shader and self.fragment_shader
-        self.program = self.load_program(vertex_shader=self.vertex_shader, \
-            fragment_shader=self.fragment_shader)
+        self.program = self.shaders.program
         # uniforms
-        if 'u_resolution' in self.program:
-            self.program['u_resolution'] = self.window_size
-        if 'u_scroll' in self.program:
-            self.program['u_scroll'] = self.u_scroll
+        if hasattr(self, 'uniforms'):
+            self.uniforms.bind(self.program)
+        else:
+            self.uniforms = UniformBindings(self.program, UNIFORMS)
+            self.uniforms['u_resolution'] = self.window_size
+            self.uniforms['u_scroll'] = self.u_scroll
 
     def render(self, time, frame_time):
+        self.frame_times.record(frame_time)
         self.ctx.clear()
-        if 'u_time' in self.program:
-            self.program['u_time'] = time        
+        if self.shaders.poll():
+            self.establish_shader()
+        self.uniforms['u_time'] = time
         self.quad.render(self.program)
 
     def mouse_position_event(self, x, y, dx, dy):
-        if 'u_mouse' in self.program:
-            self.program['u_mouse'] = (x, y)
+        self.uniforms['u_mouse'] = (x, y)
 
     def mouse_scroll_event(self, x_offset, y_offset):
         self.u_scroll = max(1.0, self.u_scroll + y_offset)
-        if 'u_scroll' in self.program:
-            self.program['u_scroll'] = self.u_scroll
+        self.uniforms['u_scroll'] = self.u_scroll
 
     def key_event(self, key, action, modifiers):
         if action == self.wnd.keys.ACTION_PRESS:
             if key == self.wnd.keys.SPACE:
                 print("SPACE key was pressed")
-                self.establish_shader()
\ No newline at end of file
+                if self.shaders.reload():
+                    self.establish_shader()
+
+    def close(self):
+        self.shaders.stop()
+        print(self.frame_times)
+        if os.environ.get(ENV_LOG):
+            self.frame_times.write(os.environ[ENV_LOG])
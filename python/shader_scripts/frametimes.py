@@ -0,0 +1,84 @@
+import os
+import csv
+import json
+import numpy as np
+
+DEFAULT_CAPACITY = 4096
+DEFAULT_BUDGET = 1/60
+# UniformImporter writes its frame times here (.csv or .json) when it closes.
+ENV_LOG = 'DODECAPLEX_FRAME_LOG'
+
+class FrameTimes:
+    """
+    The last capacity frame times in a ring buffer. A frame taking longer
+    than budget seconds counts the refreshes it missed as dropped frames.
+    """
+    def __init__(self, capacity=DEFAULT_CAPACITY, budget=DEFAULT_BUDGET):
+        self.budget = budget
+        self.times = np.zeros(capacity)
+        self.frames = self.dropped = 0
+
+    def record(self, frame_time):
+        self.times[self.frames % len(self.times)] = frame_time
+        self.frames += 1
+        self.dropped += max(0, int(round(frame_time/self.budget))-1)
+
+    def window(self):
+        # The buffered frame times, oldest first.
+        if self.frames <= len(self.times):
+            return self.times[:self.frames]
+        return np.roll(self.times, -(self.frames % len(self.times)))
+
+    def summary(self):
+        times = self.window()
+        p50, p95, p99 = np.percentile(times, (50, 95, 99)) if len(times) else (0.0,)*3
+        return {
+            'frames': self.frames,
+            'window': len(times),
+            'dropped': self.dropped,
+            'mean': float(times.mean()) if len(times) else 0.0,
+            'p50': float(p50),
+            'p95': float(p95),
+            'p99': float(p99),
+            'max': float(times.max()) if len(times) else 0.0,
+        }
+
+    def write(self, path):
+        # The summary and buffered times as JSON, or the times alone as CSV, by path's extension.
+        times = self.window()
+        if os.path.splitext(path)[1].lower() == '.csv':
+            with open(path, 'w', newline='') as output:
+                writer = csv.writer(output)
+                writer.writerow(('frame', 'frame_time'))
+                writer.writerows(zip(range(self.frames-len(times), self.frames), times.tolist()))
+        else:
+            with open(path, 'w') as output:
+                json.dump(dict(self.summary(), budget=self.budget, times=times.tolist()), output, indent=1)
+
+    def __str__(self):
+        s = self.summary()
+        return (f"{s['frames']} frames, p50 {s['p50']*1000:.2f} ms, p95 {s['p95']*1000:.2f} ms, "
+                f"p99 {s['p99']*1000:.2f} ms, {s['dropped']} dropped")
+
+def test_frame_times():
+    import tempfile
+    frames = FrameTimes(capacity=100, budget=0.01)
+    for i in range(250):
+        frames.record(0.01 if i%50 else 0.03)
+    summary = frames.summary()
+    assert summary['frames'] == 250 and summary['window'] == 100 and summary['dropped'] == 5*2
+    assert summary['p50'] == 0.01 and summary['max'] == 0.03 and summary['p99'] > summary['p95']
+    assert frames.window()[0] == 0.03 and frames.window()[-1] == 0.01 and len(frames.window()) == 100
+    with tempfile.TemporaryDirectory() as out_dir:
+        frames.write(os.path.join(out_dir, 'frames.csv'))
+        with open(os.path.join(out_dir, 'frames.csv')) as dump:
+            rows = list(csv.reader(dump))
+        assert rows[1] == ['150', '0.03'] and len(rows) == 101
+        frames.write(os.path.join(out_dir, 'frames.json'))
+        with open(os.path.join(out_dir, 'frames.json')) as dump:
+            loaded = json.load(dump)
+        assert loaded['p50'] == 0.01 and len(loaded['times']) == 100
+    assert FrameTimes().summary()['p99'] == 0.0
+
+if __name__ == "__main__":
+    test_frame_times()
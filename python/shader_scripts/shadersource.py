@@ -0,0 +1,267 @@
+import os
+import re
+import hashlib
+import threading
+
+INCLUDE = re.compile(r'^[ \t]*#include[ \t]+[<"]?([^>"\s]+)[>"]?[ \t]*$', re.M)
+WATCH_INTERVAL = 0.25
+KEPT_PROGRAMS = 2       # the current program and the one before it
+
+def expand(path, _stack=()):
+    """
+    (source, dependencies) of the shader file at path with every #include
+    line replaced by the expanded file it names, resolved relative to the
+    including file as the C++ loader does. dependencies lists each file read,
+    path first.
+    """
+    path = os.path.normpath(path)
+    if path in _stack:
+        raise ValueError(f'#include cycle: {" -> ".join(_stack+(path,))}')
+    with open(path) as shader:
+        text = shader.read()
+    dependencies, pieces, last = [path], [], 0
+    for match in INCLUDE.finditer(text):
+        source, included = expand(os.path.join(os.path.dirname(path), match.group(1)), _stack+(path,))
+        pieces += [text[last:match.start()], source]
+        dependencies += [p for p in included if p not in dependencies]
+        last = match.end()
+    pieces.append(text[last:])
+    return ''.join(pieces), dependencies
+
+def _stamp(path):
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return stat.st_mtime_ns, stat.st_size
+
+class ShaderPipeline:
+    """
+    The program compiled from shader files given by stage, e.g.
+    vertex_shader='vertex.glsl', with their includes expanded. compile takes
+    the expanded sources by the same keywords and returns a program or
+    raises. The current and previous programs are kept by the hash of their
+    sources, so a closure that is touched but unchanged, or changed back, is
+    not compiled again; older programs are released. A program is only
+    swapped in once it compiled.
+    """
+    def __init__(self, compile, resource_dir='.', **shaders):
+        self.compile, self.resource_dir, self.shaders = compile, resource_dir, shaders
+        self.program, self.key, self.error = None, None, None
+        self.compiles = 0
+        self._programs, self._stamps, self._pending = {}, {}, None
+        self._lock, self._stop, self._watcher = threading.Lock(), threading.Event(), None
+        self.reload(force=True)
+
+    def dependencies(self):
+        return list(self._stamps)
+
+    def stale(self):
+        # Whether any file of the last read closure was touched since.
+        return any(_stamp(path) != stamp for path, stamp in self._stamps.items())
+
+    def _read(self):
+        sources, stamps, digest = {}, {}, hashlib.sha256()
+        for stage, name in sorted(self.shaders.items()):
+            sources[stage], dependencies = expand(os.path.join(self.resource_dir, name))
+            stamps.update((path, _stamp(path)) for path in dependencies)
+            digest.update(f'{stage}\0{sources[stage]}\0'.encode())
+        return sources, stamps, digest.hexdigest()
+
+    def _swap(self, sources, stamps, key):
+        self._stamps = stamps
+        if key == self.key:
+            return False
+        program = self._programs.get(key)
+        if program is None:
+            try:
+                program = self.compile(**sources)
+            except Exception as error:
+                self.error = error
+                if self.program is None:
+                    raise
+                print(f'shader compile failed, keeping the previous program: {error}')
+                return False
+            self.compiles += 1
+        self._programs[key] = self._programs.pop(key, program)     # most recently used last
+        while len(self._programs) > KEPT_PROGRAMS:
+            evicted = self._programs.pop(next(iter(self._programs)))
+            if hasattr(evicted, 'release'):
+                evicted.release()
+        self.program, self.key, self.error = program, key, None
+        return True
+
+    def reload(self, force=False):
+        """
+        Reads the sources again if any dependency was touched (or force)
+        and swaps in their program. True when the program changed.
+        """
+        if not force and not self.stale():
+            return False
+        try:
+            read = self._read()
+        except (OSError, ValueError) as error:
+            self.error = error
+            if self.program is None:
+                raise
+            print(f'shader sources unreadable, keeping the previous program: {error}')
+            return False
+        return self._swap(*read)
+
+    def watch(self, interval=WATCH_INTERVAL):
+        """
+        Polls the dependency closure from a background thread, which reads
+        and hashes changed sources; poll() compiles and swaps them in on the
+        thread owning the context.
+        """
+        if self._watcher:
+            return
+        self._stop.clear()
+        def run():
+            while not self._stop.wait(interval):
+                if self.stale():
+                    try:
+                        read = self._read()
+                    except (OSError, ValueError):
+                        continue    # mid-save; the next pass will see the finished file
+                    with self._lock:
+                        self._pending = read
+                        self._stamps = read[1]
+        self._watcher = threading.Thread(target=run, daemon=True)
+        self._watcher.start()
+
+    def stop(self):
+        if self._watcher:
+            self._stop.set()
+            self._watcher.join()
+            self._watcher = None
+
+    def poll(self):
+        # Swaps in whatever the watcher read since the last call. True when the program changed.
+        with self._lock:
+            pending, self._pending = self._pending, None
+        return self._swap(*pending) if pending else False
+
+class UniformBindings:
+    """
+    A program's uniform handles, resolved once, and the last value set for
+    each name. Names the program does not declare are remembered but bind
+    to nothing; rebinding to a new program replays every remembered value.
+    """
+    def __init__(self, program, names):
+        self.names, self.values, self.handles = tuple(names), {}, {}
+        self.bind(program)
+
+    def bind(self, program):
+        self.handles = {name: program[name] for name in self.names if name in program}
+        for name, value in self.values.items():
+            if name in self.handles:
+                self.handles[name].value = value
+
+    def __setitem__(self, name, value):
+        self.values[name] = value
+        handle = self.handles.get(name)
+        if handle is not None:
+            handle.value = value
+
+def test_pipeline():
+    import time
+    import tempfile
+    def write(path, text):
+        with open(path, 'w') as shader:
+            shader.write(text)
+        stamp = time.time_ns()+write.bump
+        write.bump += 10**9
+        os.utime(path, ns=(stamp, stamp))
+    write.bump = 10**9
+    released = []
+    class Program(tuple):
+        def release(self):
+            released.append(self)
+    def compile(vertex_shader, fragment_shader):
+        if 'broken' in fragment_shader:
+            raise RuntimeError('0:3: syntax error')
+        return Program((vertex_shader, fragment_shader))
+
+    with tempfile.TemporaryDirectory() as root:
+        os.makedirs(os.path.join(root, 'lib'))
+        write(os.path.join(root, 'vertex.glsl'), '#version 330 core\nvoid main() {}\n')
+        write(os.path.join(root, 'frag.glsl'), '#version 330 core\n#include lib/sdf.glsl\nvoid main() {}\n')
+        write(os.path.join(root, 'lib', 'sdf.glsl'), '#include "consts.glsl"\nfloat f();\n')
+        write(os.path.join(root, 'lib', 'consts.glsl'), '#define PI 3.14159265\n')
+        source, dependencies = expand(os.path.join(root, 'frag.glsl'))
+        assert source == '#version 330 core\n#define PI 3.14159265\n\nfloat f();\n\nvoid main() {}\n'
+        assert [os.path.relpath(p, root) for p in dependencies] == \
+            ['frag.glsl', os.path.join('lib', 'sdf.glsl'), os.path.join('lib', 'consts.glsl')]
+
+        shaders = ShaderPipeline(compile, root, vertex_shader='vertex.glsl', fragment_shader='frag.glsl')
+        first = shaders.program
+        assert first[1] == source and shaders.compiles == 1 and len(shaders.dependencies()) == 4
+        assert not shaders.reload()
+        write(os.path.join(root, 'lib', 'consts.glsl'), '#define PI 3.14159265\n')
+        assert shaders.stale() and not shaders.reload() and shaders.compiles == 1
+        write(os.path.join(root, 'lib', 'consts.glsl'), '#define PI 3.14159265\nbroken\n')
+        assert not shaders.reload() and shaders.program is first and shaders.error is not None
+        write(os.path.join(root, 'lib', 'consts.glsl'), '#define PI 3.1416\n')
+        assert shaders.reload() and 'PI 3.1416\n' in shaders.program[1] and shaders.compiles == 2
+        second = shaders.program
+        write(os.path.join(root, 'lib', 'consts.glsl'), '#define PI 3.14159265\n')
+        assert shaders.reload() and shaders.program is first and shaders.compiles == 2 and released == []
+
+        shaders.watch(interval=0.01)
+        try:
+            write(os.path.join(root, 'vertex.glsl'), '#version 330 core\nvoid main() { }\n')
+            deadline = time.time()+5
+            while not shaders.poll():
+                assert time.time() < deadline
+                time.sleep(0.01)
+            assert shaders.program[0].endswith('{ }\n') and shaders.compiles == 3
+            assert released == [second] and len(shaders._programs) == KEPT_PROGRAMS
+        finally:
+            shaders.stop()
+
+        write(os.path.join(root, 'lib', 'consts.glsl'), '#define PI 3.14159265\nbroken\n')
+        try:
+            ShaderPipeline(compile, root, vertex_shader='vertex.glsl', fragment_shader='frag.glsl')
+            assert False
+        except RuntimeError as error:
+            assert str(error) == '0:3: syntax error'
+
+        write(os.path.join(root, 'lib', 'consts.glsl'), '#include ../frag.glsl\n')
+        try:
+            expand(os.path.join(root, 'frag.glsl'))
+            assert False
+        except ValueError:
+            pass
+
+    programs = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', 'programs')
+    for name in ('magic-spell.glsl', 'purple-vortex.glsl'):
+        source, dependencies = expand(os.path.join(programs, name))
+        assert source.startswith('#version 330 core\n') and '#include' not in source
+        assert [os.path.basename(p) for p in dependencies] == [name, 'hg_sdf.glsl']
+
+def test_bindings():
+    class Uniform:
+        value = None
+    class Program(dict):
+        lookups = 0
+        def __contains__(self, name):
+            Program.lookups += 1
+            return dict.__contains__(self, name)
+    first = Program(u_time=Uniform(), u_scroll=Uniform())
+    uniforms = UniformBindings(first, ('u_time', 'u_scroll', 'u_mouse'))
+    lookups = Program.lookups
+    for frame in range(100):
+        uniforms['u_time'] = frame*0.01
+        uniforms['u_mouse'] = (frame, frame)
+    assert Program.lookups == lookups and first['u_time'].value == 0.99
+    uniforms['u_scroll'] = 4.0
+    second = Program(u_mouse=Uniform(), u_scroll=Uniform())
+    uniforms.bind(second)
+    assert second['u_mouse'].value == (99, 99) and second['u_scroll'].value == 4.0
+    uniforms['u_time'] = 2.0
+    assert first['u_time'].value == 0.99
+
+if __name__ == "__main__":
+    test_pipeline()
+    test_bindings()
@@ -0,0 +1,145 @@
+import os
+import sys
+import json
+import time
+import atexit
+import functools
+import tracemalloc
+from contextlib import contextmanager
+
+# DODECAPLEX_PROFILE=1 turns timing on for the whole process and prints the report at exit
+# (to the file DODECAPLEX_PROFILE_OUTPUT names, if set). DODECAPLEX_PROFILE_STAGE=<name>
+# also runs that stage under cProfile, dumping <name>.prof into DODECAPLEX_PROFILE_DIR.
+ENV_ENABLE = 'DODECAPLEX_PROFILE'
+ENV_OUTPUT = 'DODECAPLEX_PROFILE_OUTPUT'
+ENV_STAGE = 'DODECAPLEX_PROFILE_STAGE'
+ENV_DIR = 'DODECAPLEX_PROFILE_DIR'
+
+_state = {'enabled': False, 'memory': False, 'profile_stage': None, 'profile_dir': '.'}
+_stages, _counters, _open = {}, {}, []
+
+def enable(memory=True, profile_stage=None, profile_dir='.'):
+    _state.update(enabled=True, memory=memory, profile_stage=profile_stage, profile_dir=profile_dir)
+    if memory and not tracemalloc.is_tracing():
+        tracemalloc.start()
+
+def disable():
+    _state['enabled'] = False
+    if _state['memory'] and tracemalloc.is_tracing():
+        tracemalloc.stop()
+
+def enabled():
+    return _state['enabled']
+
+def reset():
+    _stages.clear()
+    _counters.clear()
+
+def count(name, n=1):
+    if _state['enabled']:
+        _counters[name] = _counters.get(name, 0)+n
+
+@contextmanager
+def _measured(name):
+    entry = {'peak': 0}
+    if _state['memory']:
+        if _open:   # the peak so far belongs to the enclosing stage before it is reset
+            _open[-1]['peak'] = max(_open[-1]['peak'], tracemalloc.get_traced_memory()[1])
+        entry['base'] = tracemalloc.get_traced_memory()[0]
+        tracemalloc.reset_peak()
+    _open.append(entry)
+    profiler = None
+    if name == _state['profile_stage']:
+        import cProfile
+        profiler = cProfile.Profile()
+    start = time.perf_counter()
+    try:
+        if profiler:
+            profiler.enable()
+        yield
+    finally:
+        if profiler:
+            profiler.disable()
+            profiler.dump_stats(os.path.join(_state['profile_dir'], name+'.prof'))
+        elapsed = time.perf_counter()-start
+        _open.pop()
+        record = _stages.setdefault(name, {'calls': 0, 'seconds': 0.0, 'peak_bytes': 0})
+        record['calls'] += 1
+        record['seconds'] += elapsed
+        if _state['memory']:
+            peak = max(entry['peak'], tracemalloc.get_traced_memory()[1])
+            record['peak_bytes'] = max(record['peak_bytes'], peak-entry['base'])
+            if _open:
+                _open[-1]['peak'] = max(_open[-1]['peak'], peak)
+
+@contextmanager
+def _unmeasured():
+    yield
+
+def stage(name):
+    """
+    Context manager timing the enclosed block as stage name: its calls,
+    total seconds and peak bytes allocated above what was live on entry.
+    Does nothing while timing is disabled.
+    """
+    return _measured(name) if _state['enabled'] else _unmeasured()
+
+def timed(function=None, name=None):
+    # Decorator form of stage, named after the function unless given a name.
+    if function is None:
+        return functools.partial(timed, name=name)
+    label = name or function.__name__
+    @functools.wraps(function)
+    def wrapper(*args, **kwargs):
+        if not _state['enabled']:
+            return function(*args, **kwargs)
+        with _measured(label):
+            return function(*args, **kwargs)
+    return wrapper
+
+def report():
+    return {
+        'stages': {name: dict(record) for name, record in _stages.items()},
+        'counters': dict(_counters),
+    }
+
+def write_report(path=None):
+    text = json.dumps(report(), indent=1)
+    if path:
+        with open(path, 'w') as output:
+            output.write(text)
+    else:
+        print(text, file=sys.stderr)
+
+if os.environ.get(ENV_ENABLE, '') not in ('', '0'):
+    enable(profile_stage=os.environ.get(ENV_STAGE), profile_dir=os.environ.get(ENV_DIR, '.'))
+    atexit.register(lambda: write_report(os.environ.get(ENV_OUTPUT)))
+
+def test_stages():
+    import tempfile
+    import numpy as np
+    @timed
+    def allocate(n):
+        return np.ones(n)
+    reset()
+    allocate(10)
+    assert report() == {'stages': {}, 'counters': {}}
+    with tempfile.TemporaryDirectory() as out_dir:
+        enable(profile_stage='outer', profile_dir=out_dir)
+        try:
+            with stage('outer'):
+                allocate(2**20)
+                allocate(10)
+                count('retries', 2)
+            assert os.path.exists(os.path.join(out_dir, 'outer.prof'))
+        finally:
+            disable()
+    stages = report()['stages']
+    assert stages['allocate']['calls'] == 2 and stages['outer']['calls'] == 1
+    assert stages['outer']['seconds'] >= stages['allocate']['seconds']
+    assert stages['outer']['peak_bytes'] >= stages['allocate']['peak_bytes'] >= 8*2**20
+    assert report()['counters'] == {'retries': 2}
+    reset()
+
+if __name__ == "__main__":
+    test_stages()
@@ -0,0 +1,233 @@
+import os
+import re
+import glob
+import json
+import hashlib
+import tempfile
+import xml.etree.ElementTree as ET
+import numpy as np
+
+PARSER_VERSION = 2
+SVG_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'svgs')
+CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '.svgcache')
+PATTERN_GLOB = 'pattern_*.svg'
+
+_TOKEN = re.compile(r'[MmLlHhVvZz|]|[-+]?(?:\d+\.?\d*|\.\d+)(?:[eE][-+]?\d+)?')
+_TRANSFORM = re.compile(r'([A-Za-z]+)\s*\(([^)]*)\)')
+
+def _transform_matrix(text, parent):
+    # parent times the SVG transform list in text; anything but the six SVG transforms is refused.
+    matrix = parent
+    if _TRANSFORM.sub('', text or '').strip(' \t\r\n,'):
+        raise ValueError(f'unparsed transform: {text!r}')
+    for kind, args in _TRANSFORM.findall(text or ''):
+        values = [float(v) for v in re.split(r'[\s,]+', args.strip())]
+        if kind == 'translate':
+            a, b, c, d, e, f = 1, 0, 0, 1, values[0], values[1] if len(values) > 1 else 0
+        elif kind == 'scale':
+            a, b, c, d, e, f = values[0], 0, 0, values[-1], 0, 0
+        elif kind == 'rotate':
+            angle, (cx, cy) = np.radians(values[0]), values[1:] or (0, 0)
+            cos, sin = np.cos(angle), np.sin(angle)
+            a, b, c, d, e, f = cos, sin, -sin, cos, cx-cos*cx+sin*cy, cy-sin*cx-cos*cy
+        elif kind == 'skewX':
+            a, b, c, d, e, f = 1, 0, np.tan(np.radians(values[0])), 1, 0, 0
+        elif kind == 'skewY':
+            a, b, c, d, e, f = 1, np.tan(np.radians(values[0])), 0, 1, 0, 0
+        elif kind == 'matrix':
+            a, b, c, d, e, f = values
+        else:
+            raise ValueError(f'unsupported transform: {kind}')
+        matrix = matrix@np.array([[a, c, e], [b, d, f], [0, 0, 1]])
+    return matrix
+
+def resolve_paths(paths):
+    """
+    (paths, 4, 2) absolute corners of closed four-point path data strings
+    using M/m, L/l, H/h, V/v and Z/z. All paths are tokenized as one string
+    and every coordinate resolved at once: each axis is a run of relative
+    steps restarted by its absolute values, i.e. a segmented cumulative sum.
+    """
+    tokens = np.array(_TOKEN.findall('|'.join(paths)+'|'))
+    is_command = np.char.isalpha(tokens)
+    is_number = ~is_command & (tokens != '|')
+    command_at = np.maximum.accumulate(np.where(is_command, np.arange(len(tokens)), 0))
+    commands = tokens[command_at][is_number]
+    numbers = tokens[is_number].astype(float)
+    path_of = np.cumsum(tokens == '|')[is_number]
+
+    upper = np.char.upper(commands)
+    single = (upper == 'H') | (upper == 'V')
+    # Pairs: the position within the command's run of numbers decides x or y.
+    run_start = np.r_[True, (command_at[is_number][1:] != command_at[is_number][:-1])]
+    slot = np.arange(len(numbers))-np.maximum.accumulate(np.where(run_start, np.arange(len(numbers)), 0))
+    starts_point = single | (slot%2 == 0)
+    point_of = np.cumsum(starts_point)-1
+    n_points = point_of[-1]+1 if len(numbers) else 0
+
+    x, y = np.zeros(n_points), np.zeros(n_points)
+    x_abs, y_abs = np.zeros(n_points, dtype=bool), np.zeros(n_points, dtype=bool)
+    relative = np.char.islower(commands)
+    is_x = (upper == 'H') | (~single & (slot%2 == 0))
+    is_y = (upper == 'V') | (~single & (slot%2 == 1))
+    x[point_of[is_x]], y[point_of[is_y]] = numbers[is_x], numbers[is_y]
+    x_abs[point_of[is_x]], y_abs[point_of[is_y]] = ~relative[is_x], ~relative[is_y]
+    point_path = path_of[starts_point]
+    first = np.r_[True, point_path[1:] != point_path[:-1]]
+    x_abs |= first      # a path's opening moveto is relative to the origin either way
+    y_abs |= first
+
+    def resolve(values, absolute):
+        steps = np.where(absolute, 0, values)
+        summed = np.cumsum(steps)
+        anchor = np.maximum.accumulate(np.where(absolute, np.arange(len(values)), 0))
+        return values[anchor]+summed-summed[anchor]
+    points = np.stack((resolve(x, x_abs), resolve(y, y_abs)), axis=-1)
+    counts = np.bincount(point_path, minlength=len(paths))
+    if np.any(counts != 4):
+        raise ValueError(f'paths with other than 4 corners: {np.nonzero(counts != 4)[0].tolist()}')
+    return points.reshape(len(paths), 4, 2)
+
+def parse_rhombuses(svg_path):
+    """
+    (N, 8) x, y of the four corners of every path in svg_path, in document
+    order and with the transforms of their enclosing groups applied. The file
+    is streamed: each path's data is kept and the element discarded.
+    """
+    paths, matrices, stack = [], [], [np.eye(3)]
+    for event, element in ET.iterparse(svg_path, events=('start', 'end')):
+        tag = element.tag.rpartition('}')[2]
+        if event == 'start':
+            stack.append(_transform_matrix(element.get('transform'), stack[-1]))
+            continue
+        if tag == 'path':
+            paths.append(element.get('d'))
+            matrices.append(stack[-1])
+        stack.pop()
+        element.clear()
+    if not paths:
+        return np.zeros((0, 8))
+    corners = resolve_paths(paths)
+    homogeneous = np.concatenate((corners, np.ones(corners.shape[:2]+(1,))), axis=-1)
+    placed = np.einsum('pij,pkj->pki', np.array(matrices), homogeneous)[..., :2]
+    return placed.reshape(len(paths), 8)
+
+def _file_key(svg_path):
+    with open(svg_path, 'rb') as svg:
+        return hashlib.sha256(svg.read()+str(PARSER_VERSION).encode()).hexdigest()[:16]
+
+def _load_index(cache_dir):
+    try:
+        with open(os.path.join(cache_dir, 'index.json')) as index:
+            return json.load(index)
+    except (OSError, ValueError):
+        return {}
+
+def _parse_into_cache(svg_path, cache_dir, key):
+    corners = parse_rhombuses(svg_path)
+    staging = tempfile.NamedTemporaryFile(dir=cache_dir, suffix='.npy', delete=False)
+    with staging:
+        np.save(staging, corners)
+    os.replace(staging.name, os.path.join(cache_dir, key+'.npy'))
+    return corners
+
+def extract_patterns(paths=None, cache_dir=CACHE_DIR, jobs=1):
+    """
+    {path: (N, 8) corners} for every svg in paths (the pattern svgs by
+    default), parsed only when not cached. A file whose mtime, size and
+    parser version match the index is trusted without reading it; otherwise
+    its content hash picks the cached array, if any. Misses are parsed in jobs worker
+    processes.
+    """
+    paths = sorted(glob.glob(os.path.join(SVG_DIR, PATTERN_GLOB))) if paths is None else list(paths)
+    os.makedirs(cache_dir, exist_ok=True)
+    index = _load_index(cache_dir)
+    keys, missing = {}, []
+    for path in paths:
+        stat = os.stat(path)
+        entry = index.get(os.path.abspath(path))
+        trusted = entry and [entry['mtime_ns'], entry['size'], entry.get('parser')] == \
+            [stat.st_mtime_ns, stat.st_size, PARSER_VERSION]
+        key = entry['key'] if trusted else _file_key(path)
+        index[os.path.abspath(path)] = {'mtime_ns': stat.st_mtime_ns, 'size': stat.st_size,
+                                        'parser': PARSER_VERSION, 'key': key}
+        keys[path] = key
+        if not os.path.exists(os.path.join(cache_dir, key+'.npy')):
+            missing.append(path)
+
+    if jobs > 1 and len(missing) > 1:
+        from concurrent.futures import ProcessPoolExecutor
+        with ProcessPoolExecutor(min(jobs, len(missing))) as pool:
+            list(pool.map(_parse_into_cache, missing, [cache_dir]*len(missing), [keys[p] for p in missing]))
+    else:
+        for path in missing:
+            _parse_into_cache(path, cache_dir, keys[path])
+
+    with open(os.path.join(cache_dir, 'index.json'), 'w') as index_file:
+        json.dump(index, index_file, indent=1)
+    return {path: np.load(os.path.join(cache_dir, keys[path]+'.npy')) for path in paths}
+
+def nearest_corner_offsets(corners, tol=1e-4):
+    """
+    For the distinct corners of (N, 8) rhombuses, (corners, 2) points and
+    the (corners, 2) offset from each to its nearest other corner.
+    """
+    from scipy.spatial import cKDTree
+    from mathhelpers import tolerant_unique
+    points, _, _ = tolerant_unique(np.reshape(corners, (-1, 2)), tol)
+    if len(points) < 2:
+        return points, np.zeros_like(points)
+    _, nearest = cKDTree(points).query(points, k=2)
+    return points, points[nearest[:, 1]]-points
+
+def test_extract():
+    paths = ['m 1,2 3,0 1,1 -3,0 z', 'M 1,2 4,2 5,3 2,3 Z', 'm 1,2 h 3 l 1,1 -3,0 z', 'M 1,2 H 4 L 5,3 H 2 Z',
+             'm 1,2 v 3 l 1,1 0,-3 z', 'M1,2V5l1,1L2,3Z']
+    corners = resolve_paths(paths)
+    assert np.allclose(corners[:4], [[1, 2], [4, 2], [5, 3], [2, 3]])
+    assert np.allclose(corners[4:], [[1, 2], [1, 5], [2, 6], [2, 3]])
+    with tempfile.TemporaryDirectory() as out_dir:
+        svg_path = os.path.join(out_dir, 'pattern_0.svg')
+        with open(svg_path, 'w') as svg:
+            svg.write('<svg xmlns="http://www.w3.org/2000/svg"><g transform="translate(10,-2)">'
+                      + ''.join(f'<path d="{d}"/>' for d in paths)+'</g><path d="M 0,0 1,0 1,1 0,1 z"/></svg>')
+        cache_dir = os.path.join(out_dir, 'cache')
+        first = extract_patterns([svg_path], cache_dir)[svg_path]
+        assert first.shape == (7, 8) and np.allclose(first[0], [11, 0, 14, 0, 15, 1, 12, 1])
+        assert np.allclose(first[6], [0, 0, 1, 0, 1, 1, 0, 1])
+        cached = os.path.join(cache_dir, _file_key(svg_path)+'.npy')
+        stamp = os.stat(cached).st_mtime_ns
+        assert np.array_equal(extract_patterns([svg_path], cache_dir)[svg_path], first)
+        assert os.stat(cached).st_mtime_ns == stamp
+        global PARSER_VERSION
+        PARSER_VERSION += 1
+        try:
+            assert np.array_equal(extract_patterns([svg_path], cache_dir)[svg_path], first)
+            assert _file_key(svg_path) != os.path.basename(cached)[:-4]
+            assert os.path.exists(os.path.join(cache_dir, _file_key(svg_path)+'.npy'))
+        finally:
+            PARSER_VERSION -= 1
+        points, offsets = nearest_corner_offsets(first)
+        assert len(points) == 10 and np.allclose(np.linalg.norm(offsets, axis=1).min(), 1)
+
+    def moved(transform, point):
+        return (_transform_matrix(transform, np.eye(3))@(*point, 1))[:2]
+    assert np.allclose(moved('rotate(90)', (1, 0)), (0, 1))
+    assert np.allclose(moved('rotate(180, 1, 1)', (2, 1)), (0, 1))
+    assert np.allclose(moved('skewX(45)', (0, 2)), (2, 2)) and np.allclose(moved('skewY(45)', (2, 0)), (2, 2))
+    assert np.allclose(moved('translate(1) rotate(90,1,0), scale(2)', (1, 0)), (2, 1))
+    for unsupported in ('perspective(2)', 'rotate(90) junk'):
+        try:
+            _transform_matrix(unsupported, np.eye(3))
+            assert False
+        except ValueError:
+            pass
+
+    patterns = extract_patterns(jobs=2)
+    assert len(patterns) == len(glob.glob(os.path.join(SVG_DIR, PATTERN_GLOB)))
+    for corners in patterns.values():
+        sides = np.linalg.norm(np.diff(corners.reshape(-1, 4, 2)[:, [0, 1, 2, 3, 0]], axis=1), axis=-1)
+        assert np.allclose(sides, sides[:, :1], rtol=1e-3)
+
+if __name__ == "__main__":
+    test_extract()
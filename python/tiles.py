@@ -1,6 +1,7 @@
-import matplotlib.pyplot as plt
 import numpy as np
 from math import pi, sin, cos
+from functools import lru_cache
+from mathhelpers import tolerant_unique
 PHI = (1+(5**0.5))/2
 
 H = 1
@@ -69,26 +70,57 @@ starting_coords = {
     ], [(1,3,2), (0,3,4), (3,4,1)])
 }
 
-coordinates, triangles = starting_coords['pattern_2.svg']
+ROTATIONS = np.stack([np.linalg.matrix_power(rot, k) for k in range(5)])
 
+@lru_cache(maxsize=None)
+def pentagon_mesh(pattern, tol=1e-6):
+    """
+    The pattern's triangles turned into all five sectors of the pentagon at
+    once, as float32 (vertices, 2) positions and uint16 (triangles, 3)
+    indices. Vertices shared across the seams between sectors are merged;
+    the buffers are read-only and built once per pattern.
+    """
+    coordinates, triangles = starting_coords[pattern]
+    coordinates = np.array(coordinates, dtype=float)
+    sectors = np.matmul(coordinates, ROTATIONS).reshape(-1, 2)
+    faces = (np.array(triangles)+len(coordinates)*np.arange(5)[:, np.newaxis, np.newaxis]).reshape(-1, 3)
+    vertices, merged, _ = tolerant_unique(sectors, tol)
+    faces = merged[faces]
+    faces = faces[(faces[:, 0] != faces[:, 1]) & (faces[:, 1] != faces[:, 2]) & (faces[:, 0] != faces[:, 2])]
+    _, first = np.unique(np.sort(faces, axis=1), axis=0, return_index=True)
+    vertices, faces = vertices.astype(np.float32), faces[np.sort(first)].astype(np.uint16)
+    vertices.setflags(write=False)
+    faces.setflags(write=False)
+    return vertices, faces
 
-# Plotting
-plt.figure(figsize=(8, 8))
-for rot_num in range(5):
-    for triangle in triangles:
-        triangle_coords = np.array([coordinates[i] for i in triangle]+[coordinates[triangle[0]]])
-        for _ in range(rot_num):
-            triangle_coords = np.matmul(triangle_coords, rot)
-        x, y = zip(*triangle_coords)
-        plt.plot(x, y, marker='o')
+def test_pentagon_mesh():
+    for pattern, (coordinates, triangles) in starting_coords.items():
+        vertices, faces = pentagon_mesh(pattern)
+        assert pentagon_mesh(pattern)[0] is vertices
+        assert vertices.dtype == np.float32 and faces.dtype == np.uint16 and faces.max() < len(vertices)
+        assert len(tolerant_unique(vertices, 1e-5)[0]) == len(vertices)
+        turned = vertices.astype(float)@rot
+        assert len(tolerant_unique(np.concatenate((vertices, turned)), 1e-5)[0]) == len(vertices)
+        def area(points, tris):
+            (ux, uy), (vx, vy) = (points[tris[:, 1]]-points[tris[:, 0]]).T, (points[tris[:, 2]]-points[tris[:, 0]]).T
+            return np.abs(ux*vy-uy*vx).sum()/2
+        assert np.isclose(area(vertices.astype(float), faces), 5*area(np.array(coordinates, dtype=float), np.array(triangles)), rtol=1e-5)
 
-plt.axhline(0, color='gray', linewidth=0.5, linestyle='--')
-plt.axvline(0, color='gray', linewidth=0.5, linestyle='--')
-plt.gca().set_aspect('equal', adjustable='box')
-plt.legend()
-plt.title("Triangles Visualization")
-plt.xlabel("X-axis")
-plt.ylabel("Y-axis")
-plt.grid(True)
-plt.show()
-print(rot)
\ No newline at end of file
+if __name__ == "__main__":
+    import matplotlib.pyplot as plt
+    test_pentagon_mesh()
+    vertices, faces = pentagon_mesh('pattern_2.svg')
+
+    # Plotting
+    plt.figure(figsize=(8, 8))
+    plt.triplot(vertices[:, 0], vertices[:, 1], faces, marker='o')
+
+    plt.axhline(0, color='gray', linewidth=0.5, linestyle='--')
+    plt.axvline(0, color='gray', linewidth=0.5, linestyle='--')
+    plt.gca().set_aspect('equal', adjustable='box')
+    plt.title("Triangles Visualization")
+    plt.xlabel("X-axis")
+    plt.ylabel("Y-axis")
+    plt.grid(True)
+    plt.show()
+    print(rot)
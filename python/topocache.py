@@ -0,0 +1,104 @@
+import os
+import shutil
+import hashlib
+import tempfile
+import numpy as np
+import mathhelpers
+import neighbors
+import golden as golden_field
+from golden import to_float
+import fourdsolids
+from fourdsolids import *
+from stagetimer import timed, count
+
+CACHE_VERSION = 1
+CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '.topocache')
+
+TOPOLOGY_FIELDS = (
+    'dodecaplex_vertices',          # (600, 4)
+    'tetraplex_vertices',           # (120, 4) cell centers
+    'dodecaplex_golden',            # (600, 4) exact GOLDEN coordinates of dodecaplex_vertices
+    'tetraplex_golden',             # (120, 4) exact GOLDEN coordinates of tetraplex_vertices
+    'cell_vertices',                # (120, 20) vertex indices per cell
+    'vertex_cells',                 # (600, 4) cell indices per vertex
+    'cell_neighbors',               # (120, 12) adjacent cells
+    'cell_faces',                   # (120, 12, 5) outward wound pentagon shared with each adjacent cell
+    'neighbor_transforms',          # (120, 12, 4, 4) maps each adjacent cell onto the cell
+    'hop_distances',                # (120, 120) steps between cells through the neighbor graph
+)
+
+def cache_key():
+    """
+    Hash of everything the topology is generated from: the seed points,
+    tolerances and the source of the modules that turn them into arrays.
+    """
+    key = hashlib.sha256(repr((
+        CACHE_VERSION, DODECAPLEX_POINTS, D_EVENS, TETRAPLEX_POINTS, T_EVENS,
+        EDGE_120CELL, RADIUS_120CELL, DISTANCE_600CELL, neighbors.DEFAULT_TOL,
+    )).encode())
+    for path in (mathhelpers.__file__, neighbors.__file__, golden_field.__file__, fourdsolids.__file__, __file__):
+        with open(path, 'rb') as source:
+            key.update(source.read())
+    return key.hexdigest()[:16]
+
+@timed
+def build_topology():
+    d4vs, t4vs = gen_dodecaplex_golden(), gen_tetraplex_golden()
+    d4v_arr, t4v_arr = to_float(d4vs), to_float(t4vs)
+    cell_verts, vertex_cells = get_cell_incidence(d4vs, t4vs)
+    neighbor_map = get_neighbor_map(t4vs)
+    cell_neighbors = np.array([neighbor_map[i] for i in range(len(t4vs))])
+    return {
+        'dodecaplex_vertices': d4v_arr,
+        'tetraplex_vertices': t4v_arr,
+        'dodecaplex_golden': d4vs,
+        'tetraplex_golden': t4vs,
+        'cell_vertices': cell_verts,
+        'vertex_cells': vertex_cells,
+        'cell_neighbors': cell_neighbors,
+        'cell_faces': get_cell_pentagons(d4v_arr, t4v_arr, get_cell_faces(cell_verts, cell_neighbors)),
+        'neighbor_transforms': get_neighbor_transforms(d4v_arr, t4v_arr, cell_verts, cell_neighbors),
+        'hop_distances': get_hop_distances(neighbor_map),
+    }
+
+def _store(topology, cache_dir, key):
+    os.makedirs(cache_dir, exist_ok=True)
+    staging = tempfile.mkdtemp(prefix='.tmp-', dir=cache_dir)
+    for name in TOPOLOGY_FIELDS:
+        np.save(os.path.join(staging, name+'.npy'), np.ascontiguousarray(topology[name]))
+    target = os.path.join(cache_dir, key)
+    shutil.rmtree(target, ignore_errors=True)
+    os.replace(staging, target)
+    for entry in os.listdir(cache_dir):
+        if entry != key and not entry.startswith('.tmp-'):
+            shutil.rmtree(os.path.join(cache_dir, entry), ignore_errors=True)
+
+def load_topology(cache_dir=CACHE_DIR, key=None, rebuild=False):
+    """
+    Topology arrays keyed by TOPOLOGY_FIELDS, memory-mapped read-only from
+    the on-disk cache. Entries whose key no longer matches are rebuilt and
+    the stale ones removed.
+    """
+    key = cache_key() if key is None else key
+    entry = os.path.join(cache_dir, key)
+    if not rebuild:
+        try:
+            topology = {name: np.load(os.path.join(entry, name+'.npy'), mmap_mode='r') for name in TOPOLOGY_FIELDS}
+            count('topology.cache_hit')
+            return topology
+        except (OSError, ValueError):
+            count('topology.cache_miss')
+    _store(build_topology(), cache_dir, key)
+    return load_topology(cache_dir, key)
+
+def test_round_trip():
+    with tempfile.TemporaryDirectory() as cache_dir:
+        built = build_topology()
+        first = load_topology(cache_dir, key='a')
+        assert all(np.array_equal(first[name], built[name]) for name in TOPOLOGY_FIELDS)
+        assert isinstance(load_topology(cache_dir, key='a')['cell_faces'], np.memmap)
+        load_topology(cache_dir, key='b')
+        assert os.listdir(cache_dir) == ['b']
+
+if __name__ == "__main__":
+    test_round_trip()